@@ -23,6 +23,10 @@ import shutil
 import threading
 import platform
 import logging
+import struct
+import time
+import queue
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 # Configuración del logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -35,6 +39,17 @@ logging.info(f"Sistema operativo detectado: {OPERATING_SYSTEM}")
 RAR_PATH_WINDOWS = r"C:\Program Files\WinRAR\Rar.exe"
 RAR_PATH_LINUX = None
 
+# Planificador por espacio libre: trabajos simultáneos, margen que nunca se ocupa y espera entre comprobaciones
+MAX_JOBS = os.cpu_count() or 2
+SPACE_SAFETY_MARGIN = 0.05
+SPACE_POLL_SECONDS = 5
+UNKNOWN_EXPANSION_RATIO = 3  # Estimación de tamaño descomprimido cuando el archivo no lo declara
+
+# Los hilos de trabajo no tocan Tk: dejan eventos en una cola que el bucle de Tk vacía por lotes
+LOG_PUMP_MS = 100
+LOG_PUMP_MAX_EVENTS = 500     # Eventos como máximo por pasada, para no bloquear la interfaz
+TERMINAL_MAX_LINES = 2000     # Las líneas más antiguas se descartan
+
 def find_rar_linux():
     common_paths = [
         '/usr/bin/rar',
@@ -97,6 +112,78 @@ check_and_install_dependencies()
 import py7zr
 import rarfile
 
+def declared_uncompressed_size(file_path):
+    """
+    Tamaño descomprimido que declara el propio archivo, sin extraerlo: directorio central del ZIP,
+    campo ISIZE del final del gzip, cabeceras de 7z o RAR. Si no se puede leer, se estima.
+    """
+    try:
+        if file_path.endswith('.zip'):
+            with zipfile.ZipFile(file_path, 'r') as zip_ref:
+                return sum(member.file_size for member in zip_ref.infolist())
+        if file_path.endswith('.tar.gz'):
+            compressed = os.path.getsize(file_path)
+            with open(file_path, 'rb') as f:
+                f.seek(-4, os.SEEK_END)
+                size = struct.unpack('<I', f.read(4))[0]
+            # ISIZE es el tamaño módulo 2^32, así que no distingue 1 GB de 5 GB. Solo es fiable si el
+            # contenido no puede pasar de 4 GB; si puede, se toma la estimación conservadora cuando
+            # es mayor (un gzip muy comprimible de más de 4 GB puede seguir quedándose corto)
+            while size < compressed:
+                size += 1 << 32
+            if compressed * UNKNOWN_EXPANSION_RATIO >= 1 << 32:
+                size = max(size, compressed * UNKNOWN_EXPANSION_RATIO)
+            return size
+        if file_path.endswith('.7z'):
+            with py7zr.SevenZipFile(file_path, mode='r') as seven_zip:
+                return seven_zip.archiveinfo().uncompressed
+        if file_path.endswith('.rar'):
+            with rarfile.RarFile(file_path, 'r') as rar_ref:
+                return sum(member.file_size for member in rar_ref.infolist())
+    except Exception as e:
+        logging.warning(f"No se pudo leer el tamaño descomprimido de {file_path}: {e}")
+    return os.path.getsize(file_path) * UNKNOWN_EXPANSION_RATIO
+
+class SpaceScheduler:
+    """
+    Reparte el espacio libre entre los trabajos. Cada trabajo declara cuánto ocupará en cada disco
+    (la extracción en el temporal y la salida junto al original) y solo arranca si cabe en lo que
+    queda libre menos lo ya reservado por los trabajos en curso y un margen de seguridad.
+    """
+    def __init__(self, margin=SPACE_SAFETY_MARGIN):
+        self.margin = margin
+        self.reserved = {}  # dispositivo -> bytes reservados por trabajos en curso
+        self.paths = {}     # dispositivo -> una ruta para consultar su espacio libre
+
+    def needs_for(self, file, temp_root):
+        needs = {}
+        for path, amount in ((temp_root, declared_uncompressed_size(file)),
+                             (os.path.dirname(file), os.path.getsize(file))):
+            dev = os.stat(path).st_dev
+            self.paths.setdefault(dev, path)
+            needs[dev] = needs.get(dev, 0) + amount
+        return needs
+
+    def available(self, dev):
+        usage = shutil.disk_usage(self.paths[dev])
+        return usage.free - self.margin * usage.total - self.reserved.get(dev, 0)
+
+    def fits(self, needs):
+        return all(amount <= self.available(dev) for dev, amount in needs.items())
+
+    def could_ever_fit(self, needs):
+        """Si ni con el disco vacío de otros trabajos cabría, esperar no serviría de nada."""
+        return all(amount <= shutil.disk_usage(self.paths[dev]).total * (1 - self.margin)
+                   for dev, amount in needs.items())
+
+    def reserve(self, needs):
+        for dev, amount in needs.items():
+            self.reserved[dev] = self.reserved.get(dev, 0) + amount
+
+    def release(self, needs):
+        for dev, amount in needs.items():
+            self.reserved[dev] -= amount
+
 class ReCompresionApp:
     def __init__(self, master):
         self.master = master
@@ -112,7 +199,11 @@ class ReCompresionApp:
 
         self.processing = False  # Flag para controlar si el proceso está en marcha
 
+        self.events = queue.Queue()  # (tipo, datos) que producen los hilos y consume drain_events
+        self.started_at = None
+
         self.create_widgets()
+        self.master.after(LOG_PUMP_MS, self.drain_events)
 
     def create_widgets(self):
         # Frame principal
@@ -154,11 +245,15 @@ class ReCompresionApp:
 
         # Barra de progreso
         self.progress = ttk.Progressbar(main_frame, length=400, mode="determinate")
-        self.progress.grid(row=5, column=0, columnspan=3, pady=10, sticky="ew")
+        self.progress.grid(row=5, column=0, columnspan=3, pady=(10, 0), sticky="ew")
+
+        # Velocidad y tiempo restante
+        self.throughput_label = tk.Label(main_frame, text="", anchor="w")
+        self.throughput_label.grid(row=6, column=0, columnspan=3, sticky="ew")
 
         # Terminal
-        self.terminal = scrolledtext.ScrolledText(main_frame, width=92, height=15)
-        self.terminal.grid(row=6, column=0, columnspan=3, pady=10)
+        self.terminal = scrolledtext.ScrolledText(main_frame, width=92, height=14)
+        self.terminal.grid(row=7, column=0, columnspan=3, pady=10)
 
         # Configurar el peso de las columnas
         main_frame.columnconfigure(1, weight=1)
@@ -231,7 +326,11 @@ class ReCompresionApp:
         self.start_button.config(state=tk.DISABLED)
         self.cancel_button.config(state=tk.NORMAL)
         self.exit_button.config(state=tk.DISABLED)
-        threading.Thread(target=self.process_files, daemon=True).start()
+        self.progress['value'] = 0
+        self.started_at = time.time()
+        # Opciones leídas una sola vez, en el hilo de Tk: el hilo de trabajo no toca sus variables
+        settings = (self.compression_format.get(), self.compression_level.get(), self.original_action.get())
+        threading.Thread(target=self.process_files, args=(self.directory.get(), settings), daemon=True).start()
 
     def cancel_process(self):
         self.processing = False
@@ -242,61 +341,156 @@ class ReCompresionApp:
         if messagebox.askokcancel("Salir", "¿Estás seguro de que quieres salir?"):
             self.master.quit()
 
-    def process_files(self):
+    def process_files(self, directory, settings):
+        try:
+            self.run_jobs(directory, settings)
+        except Exception as e:
+            self.log_to_terminal(f"Error inesperado: {str(e)}")
+        finally:
+            # Pase lo que pase, la interfaz recupera los botones
+            self.processing = False
+            self.events.put(('fin', None))
+
+    def run_jobs(self, directory, settings):
         self.log_to_terminal("Iniciando proceso de compresión...")
-        compressed_files = self.get_compressed_files(self.directory.get())
+        compressed_files = self.get_compressed_files(directory)
         total_files = len(compressed_files)
         processed_files = 0
+        finished_files = 0
+        sizes = {file: os.path.getsize(file) for file in compressed_files}
+        finished_bytes = 0
 
-        temp_root = tempfile.mkdtemp(dir=self.directory.get())
-        old_dir = os.path.join(self.directory.get(), self.backup_dir_name)
+        temp_root = tempfile.mkdtemp(dir=directory)
+        old_dir = os.path.join(directory, self.backup_dir_name)
 
-        for file in compressed_files:
-            if not self.processing:
-                break
-            try:
-                self.log_to_terminal(f"Procesando archivo: {file}")
-
-                temp_dir = tempfile.mkdtemp(dir=temp_root)
-                self.decompress_file(file, temp_dir)
+        try:
+            # Los más grandes primero; si el siguiente no cabe, se adelanta otro más pequeño que sí quepa
+            scheduler = SpaceScheduler()
+            pending = []
+            for file in compressed_files:
+                needs = scheduler.needs_for(file, temp_root)
+                if scheduler.could_ever_fit(needs):
+                    pending.append((file, needs))
+                else:
+                    finished_files += 1
+                    self.log_to_terminal(f"Error: {file} necesita {sum(needs.values()) / 1e9:.1f} GB y no cabe en el disco ni vacío. Se omite.")
+            pending.sort(key=lambda job: -sum(job[1].values()))
+
+            running = {}
+            paused = False
+            with ThreadPoolExecutor(max_workers=MAX_JOBS) as executor:
+                while (pending or running) and (self.processing or running):
+                    job = None
+                    if self.processing and pending and len(running) < MAX_JOBS:
+                        job = next((j for j in pending if scheduler.fits(j[1])), None)
+                    if job:
+                        if paused:
+                            self.log_to_terminal("Hay espacio libre de nuevo. Se reanuda el proceso.")
+                            paused = False
+                        pending.remove(job)
+                        scheduler.reserve(job[1])
+                        running[executor.submit(self.process_single_file, job[0], temp_root, old_dir, settings)] = job
+                        continue
+                    if not running:
+                        if not self.processing:
+                            break
+                        # Nada en marcha y nada cabe: se espera a que se libere espacio en vez de fallar
+                        if not paused:
+                            self.log_to_terminal(f"Espacio libre insuficiente para {pending[0][0]}. En pausa hasta que se libere espacio...")
+                            paused = True
+                        time.sleep(SPACE_POLL_SECONDS)
+                        continue
+                    done, _ = wait(running, timeout=SPACE_POLL_SECONDS, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        file, needs = running.pop(future)
+                        scheduler.release(needs)
+                        finished_files += 1
+                        finished_bytes += sizes[file]
+                        try:
+                            future.result()
+                            processed_files += 1
+                        except Exception as e:
+                            self.log_to_terminal(f"Error al procesar {file}: {str(e)}")
+                        progress = (finished_files / total_files) * 100
+                        self.update_progress(finished_files, total_files, finished_bytes, sum(sizes.values()))
+                        self.log_to_terminal(f"Progreso: {processed_files}/{total_files} archivos procesados ({progress:.2f}%)")
+        finally:
+            shutil.rmtree(temp_root, ignore_errors=True)
 
-                base_name = os.path.splitext(file)[0]
-                if file.endswith('.tar.gz'):
-                    base_name = os.path.splitext(base_name)[0]  # Remove .tar part
+        if self.processing:
+            self.log_to_terminal(f"Proceso completado. {processed_files}/{total_files} archivos procesados.")
+        else:
+            self.log_to_terminal(f"Proceso cancelado. {processed_files}/{total_files} archivos procesados.")
 
-                output_path = base_name + '.' + self.compression_format.get()
-                self.compress_files(temp_dir, output_path, self.compression_format.get(), self.compression_level.get())
+    def process_single_file(self, file, temp_root, old_dir, settings):
+        compression_format, compression_level, original_action = settings
+        self.log_to_terminal(f"Procesando archivo: {file}")
 
-                shutil.rmtree(temp_dir)
+        temp_dir = tempfile.mkdtemp(dir=temp_root)
+        try:
+            self.decompress_file(file, temp_dir)
 
-                self.handle_original_files(file, self.original_action.get(), old_dir)
+            base_name = os.path.splitext(file)[0]
+            if file.endswith('.tar.gz'):
+                base_name = os.path.splitext(base_name)[0]  # Remove .tar part
 
-                processed_files += 1
-                progress = (processed_files / total_files) * 100
-                self.update_progress(progress)
-                self.log_to_terminal(f"Progreso: {processed_files}/{total_files} archivos procesados ({progress:.2f}%)")
-            except Exception as e:
-                self.log_to_terminal(f"Error al procesar {file}: {str(e)}")
+            output_path = base_name + '.' + compression_format
+            self.compress_files(temp_dir, output_path, compression_format, compression_level)
+        finally:
+            shutil.rmtree(temp_dir)
 
-        shutil.rmtree(temp_root)
+        self.handle_original_files(file, original_action, old_dir)
 
-        if self.processing:
-            self.log_to_terminal(f"Proceso completado. {processed_files}/{total_files} archivos procesados.")
-        else:
-            self.log_to_terminal(f"Proceso cancelado. {processed_files}/{total_files} archivos procesados.")
+    def update_progress(self, finished, total, finished_bytes, total_bytes):
+        self.events.put(('progreso', (finished, total, finished_bytes, total_bytes)))
 
-        self.processing = False
-        self.start_button.config(state=tk.NORMAL)
-        self.cancel_button.config(state=tk.DISABLED)
-        self.exit_button.config(state=tk.NORMAL)
+    def log_to_terminal(self, message):
+        # Seguro desde cualquier hilo: solo encola; drain_events lo escribe desde el bucle de Tk
+        self.events.put(('log', message))
 
-    def update_progress(self, value):
-        self.progress['value'] = value
-        self.master.update_idletasks()
+    def drain_events(self):
+        """Vacía la cola de eventos por lotes: una sola inserción de texto y una actualización de progreso."""
+        lines, progress, finished = [], None, False
+        try:
+            for _ in range(LOG_PUMP_MAX_EVENTS):
+                kind, data = self.events.get_nowait()
+                if kind == 'log':
+                    lines.append(data)
+                elif kind == 'progreso':
+                    progress = data  # Solo importa el último
+                elif kind == 'fin':
+                    finished = True
+        except queue.Empty:
+            pass
 
-    def log_to_terminal(self, message):
-        self.terminal.insert(tk.END, message + "\n")
-        self.terminal.see(tk.END)
+        try:
+            if lines:
+                self.terminal.insert(tk.END, "\n".join(lines) + "\n")
+                excess = int(self.terminal.index('end-1c').split('.')[0]) - 1 - TERMINAL_MAX_LINES
+                if excess > 0:
+                    self.terminal.delete('1.0', f'{excess + 1}.0')
+                self.terminal.see(tk.END)
+            if progress:
+                self.show_throughput(*progress)
+            if finished:
+                self.start_button.config(state=tk.NORMAL)
+                self.cancel_button.config(state=tk.DISABLED)
+                self.exit_button.config(state=tk.NORMAL)
+        finally:
+            # Si falla el pintado de un lote, la bomba sigue viva y los eventos siguientes no se pierden
+            self.master.after(LOG_PUMP_MS, self.drain_events)
+
+    def show_throughput(self, finished, total, finished_bytes, total_bytes):
+        self.progress['value'] = (finished / total) * 100 if total else 100
+        elapsed = time.time() - (self.started_at or time.time())
+        if not finished or elapsed <= 0:
+            return
+        rate = finished / elapsed
+        remaining = (total - finished) / rate
+        self.throughput_label.config(
+            text=f"{finished}/{total} archivos · {rate:.1f} archivos/s · {finished_bytes / 1e6 / elapsed:.1f} MB/s · "
+                 f"quedan {int(remaining // 60)}:{int(remaining % 60):02d} "
+                 f"({(total_bytes - finished_bytes) / 1e6:.0f} MB)")
 
     def decompress_file(self, file_path, temp_dir):
         if file_path.endswith('.zip'):
@@ -342,8 +536,7 @@ class ReCompresionApp:
         if action == "Eliminar":
             os.remove(file)
         elif action == "Mover a 'BACKUP'":
-            if not os.path.exists(old_dir):
-                os.makedirs(old_dir)
+            os.makedirs(old_dir, exist_ok=True)
             shutil.move(file, old_dir)
         elif action == "Mantener":
             pass
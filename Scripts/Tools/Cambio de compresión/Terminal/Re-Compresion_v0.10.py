@@ -1,238 +1,1793 @@
-"""
-Nombre del Programa: Re-Compresion
-Versión: 0.10
-Fecha: 25 de julio de 2024
-Correo electrónico: carlymx@gmail.com
-
-Descripción:
-Este script permite cambiar el tipo de compresión de una lista de archivos comprimidos en un directorio especificado.
-1. Detecta el sistema operativo.
-2. Pide un directorio a analizar.
-3. Analiza el directorio y muestra la cantidad de archivos comprimidos que contiene y en qué formatos (.zip, .7z, .tar.gz, .rar).
-4. Pide en qué formato quieres recomprimir los archivos (1: .zip, 2: .7z, 3: .tar.gz, 4: .rar).
-5. Pide el nivel de compresión (Entre 0, ninguna compresión y 10, máxima compresión). Por defecto 5.
-6. Muestra lo que va a hacer y pide confirmación.
-7. Descomprime cada archivo en un directorio temporal dentro del directorio asignado y luego recomprime manteniendo el mismo nombre y propiedades de archivos. Mientras lo hace, muestra al usuario el archivo con el que está trabajando, el % parcial y el % total de los archivos a procesar.
-8. Muestra información final del proceso, si ha habido errores y demás información relevante.
-9. Pregunta al usuario qué hacer con los archivos originales después de procesarlos (1: Eliminarlos, 2: Moverlos a un directorio "backup", 3: Mantenerlos en su sitio. Por defecto: Moverlos al directorio).
-"""
-
-import os
-import shutil
-import zipfile
-import tarfile
-import tempfile
-import subprocess
-import sys
-import platform
-import logging
-
-# Configuración del logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-
-# Detección del sistema operativo
-OPERATING_SYSTEM = platform.system()
-logging.info(f"Sistema operativo detectado: {OPERATING_SYSTEM}")
-
-# Variables globales para las rutas de RAR
-RAR_PATH_WINDOWS = r"C:\Program Files\WinRAR\Rar.exe"
-RAR_PATH_LINUX = None
-
-def find_rar_linux():
-    common_paths = [
-        '/usr/bin/rar',
-        '/usr/local/bin/rar',
-        '/opt/rar/rar',
-        '/usr/share/rar/rar'
-    ]
-    for path in common_paths:
-        if os.path.isfile(path):
-            return path
-    return None
-
-def check_rar_availability():
-    global RAR_PATH_LINUX
-    if OPERATING_SYSTEM == 'Windows':
-        rar_command = RAR_PATH_WINDOWS
-    else:
-        RAR_PATH_LINUX = find_rar_linux()
-        rar_command = RAR_PATH_LINUX or 'rar'
-    
-    if shutil.which(rar_command) is None:
-        logging.warning("No se encontró el comando RAR. La compresión y descompresión en formato RAR no estarán disponibles.")
-        if OPERATING_SYSTEM == 'Windows':
-            logging.warning("Por favor, instala WinRAR y asegúrate de que esté en la ruta: " + RAR_PATH_WINDOWS)
-        else:
-            logging.warning("Por favor, instala el paquete 'rar' en tu sistema Linux.")
-            logging.warning("Puedes hacerlo con: sudo apt-get install rar (para sistemas basados en Debian/Ubuntu)")
-            logging.warning("O busca el paquete equivalente para tu distribución Linux.")
-        return False
-    logging.info(f"RAR encontrado en: {rar_command}")
-    return True
-
-def check_and_install_dependencies():
-    try:
-        import py7zr
-    except ImportError:
-        logging.info("py7zr no está instalado. Instalando...")
-        subprocess.check_call([sys.executable, "-m", "pip", "install", "py7zr"])
-
-    try:
-        import rarfile
-    except ImportError:
-        logging.info("rarfile no está instalado. Instalando...")
-        subprocess.check_call([sys.executable, "-m", "pip", "install", "rarfile"])
-
-def get_compressed_files(directory):
-    compressed_files = []
-    for root, dirs, files in os.walk(directory):
-        for file in files:
-            if file.endswith(('.zip', '.7z', '.tar.gz', '.rar')):
-                compressed_files.append(os.path.join(root, file))
-    return compressed_files
-
-def decompress_file(file_path, temp_dir):
-    import py7zr
-    import rarfile
-
-    if file_path.endswith('.zip'):
-        with zipfile.ZipFile(file_path, 'r') as zip_ref:
-            zip_ref.extractall(temp_dir)
-    elif file_path.endswith('.tar.gz'):
-        with tarfile.open(file_path, 'r:gz') as tar_ref:
-            tar_ref.extractall(temp_dir)
-    elif file_path.endswith('.7z'):
-        with py7zr.SevenZipFile(file_path, mode='r') as seven_zip:
-            seven_zip.extractall(temp_dir)
-    elif file_path.endswith('.rar'):
-        if not check_rar_availability():
-            raise ValueError("RAR no está disponible en el sistema. No se puede descomprimir el archivo.")
-        with rarfile.RarFile(file_path, 'r') as rar_ref:
-            rar_ref.extractall(temp_dir)
-    else:
-        raise ValueError(f"Formato de archivo no soportado: {file_path}")
-
-def compress_files(temp_dir, output_path, format, compression_level):
-    import py7zr
-    if format == 'zip':
-        with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED, compresslevel=compression_level) as zip_ref:
-            for root, dirs, files in os.walk(temp_dir):
-                for file in files:
-                    zip_ref.write(os.path.join(root, file), os.path.relpath(os.path.join(root, file), temp_dir))
-    elif format == 'tar.gz':
-        with tarfile.open(output_path, 'w:gz') as tar_ref:
-            tar_ref.add(temp_dir, arcname=os.path.basename(temp_dir))
-    elif format == '7z':
-        with py7zr.SevenZipFile(output_path, 'w', filters=[{"id": py7zr.FILTER_LZMA2, "preset": compression_level}]) as seven_zip:
-            seven_zip.writeall(temp_dir, os.path.basename(temp_dir))
-    elif format == 'rar':
-        if not check_rar_availability():
-            raise ValueError("RAR no está disponible en el sistema. No se puede comprimir en formato RAR.")
-        
-        rar_command = RAR_PATH_WINDOWS if OPERATING_SYSTEM == 'Windows' else (RAR_PATH_LINUX or 'rar')
-        subprocess.check_call([rar_command, 'a', '-m{}'.format(compression_level), output_path] + 
-                              [os.path.join(root, file) for root, dirs, files in os.walk(temp_dir) for file in files])
-    else:
-        raise ValueError(f"Formato de compresión no soportado: {format}")
-
-def handle_original_files(file, action, backup_dir):
-    if action == '1':
-        os.remove(file)
-    elif action == '2':
-        if not os.path.exists(backup_dir):
-            os.makedirs(backup_dir)
-        shutil.move(file, backup_dir)
-    elif action == '3':
-        pass
-    else:
-        shutil.move(file, backup_dir)
-
-def main():
-    # Verificar e instalar dependencias
-    check_and_install_dependencies()
-    import py7zr
-    import rarfile
-
-    # Verificar disponibilidad de RAR
-    rar_available = check_rar_availability()
-
-    # 1. Pedir el directorio a analizar
-    directory = input("Introduce el directorio a analizar: ")
-
-    # 2. Analizar el directorio y mostrar la cantidad de archivos comprimidos y sus formatos
-    compressed_files = get_compressed_files(directory)
-    file_formats = {'.zip': 0, '.tar.gz': 0, '.7z': 0, '.rar': 0}
-
-    for file in compressed_files:
-        for format in file_formats:
-            if file.endswith(format):
-                file_formats[format] += 1
-
-    logging.info(f"Archivos encontrados: {len(compressed_files)}")
-    for format, count in file_formats.items():
-        logging.info(f"{format}: {count}")
-
-    # 3. Pedir el formato de recompresión deseado
-    print("Selecciona el formato de recompresión deseado:")
-    print("1: .zip")
-    print("2: .7z")
-    print("3: .tar.gz")
-    print("4: .rar")
-    format_option = input("Introduce el número correspondiente al formato (1/2/3/4): ")
-    format_map = {'1': 'zip', '2': '7z', '3': 'tar.gz', '4': 'rar'}
-    recompression_format = format_map.get(format_option, 'zip')
-
-    if recompression_format == 'rar' and not rar_available:
-        logging.warning("RAR no está disponible. Por favor, elige otro formato.")
-        return
-
-    # 4. Pedir el nivel de compresión
-    compression_level = input("Introduce el nivel de compresión (0-10, por defecto 5): ")
-    compression_level = int(compression_level) if compression_level else 5
-
-    # 5. Mostrar lo que va a hacer y pedir confirmación
-    logging.info(f"Recomprimir {len(compressed_files)} archivos a formato {recompression_format} con nivel de compresión {compression_level}")
-    confirm = input("¿Deseas continuar? (s/n): ")
-    if confirm.lower() != 's':
-        logging.info("Operación cancelada.")
-        return
-
-    # 6. Preguntar qué hacer con los archivos originales
-    original_action = input("¿Qué quieres hacer con los archivos originales después de procesarlos? (1: Eliminarlos, 2: Moverlos a un directorio 'backup', 3: Mantenerlos en su sitio. Por defecto: 2): ")
-    original_action = original_action if original_action in ['1', '2', '3'] else '2'
-    backup_dir = os.path.join(directory, "backup")
-
-    # 7. Descomprimir y recomprimir los archivos
-    temp_root = tempfile.mkdtemp(dir=directory)
-    total_files = len(compressed_files)
-    processed_files = 0
-
-    for file in compressed_files:
-        logging.info(f"Procesando archivo: {file}")
-        temp_dir = tempfile.mkdtemp(dir=temp_root)
-        try:
-            decompress_file(file, temp_dir)
-            base_name = os.path.splitext(file)[0]
-            if file.endswith('.tar.gz'):
-                base_name = os.path.splitext(base_name)[0]  # Remove .tar part
-            output_path = base_name + '.' + recompression_format
-            compress_files(temp_dir, output_path, recompression_format, compression_level)
-            handle_original_files(file, original_action, backup_dir)
-            processed_files += 1
-        except Exception as e:
-            logging.error(f"Error procesando {file}: {str(e)}")
-        finally:
-            shutil.rmtree(temp_dir)
-
-        logging.info(f"Progreso: {processed_files}/{total_files} archivos procesados ({(processed_files/total_files) * 100:.2f}%)")
-
-    # 8. Mostrar información final del proceso
-    logging.info("Proceso completado.")
-    logging.info(f"Archivos procesados: {processed_files}")
-    if processed_files != total_files:
-        logging.warning(f"Errores encontrados: {total_files - processed_files}")
-
-    shutil.rmtree(temp_root)
-
-if __name__ == "__main__":
-    main()
+"""
+Nombre del Programa: Re-Compresion
+Versión: 0.10
+Fecha: 25 de julio de 2024
+Correo electrónico: carlymx@gmail.com
+
+Descripción:
+Este script permite cambiar el tipo de compresión de una lista de archivos comprimidos en un directorio especificado.
+1. Detecta el sistema operativo.
+2. Pide un directorio a analizar.
+3. Analiza el directorio y muestra la cantidad de archivos comprimidos que contiene y en qué formatos (.zip, .7z, .tar.gz, .rar, .tar.xz, .tar.zst).
+4. Pide en qué formato quieres recomprimir los archivos (1: .zip, 2: .7z, 3: .tar.gz, 4: .rar, 5: .tar.xz, 6: .tar.zst si zstandard está instalado).
+5. Pide el nivel de compresión (Entre 0, ninguna compresión y 10, máxima compresión). Por defecto 5.
+6. Muestra lo que va a hacer y pide confirmación.
+7. Descomprime cada archivo en un directorio temporal dentro del directorio asignado y luego recomprime manteniendo el mismo nombre y propiedades de archivos. Mientras lo hace, muestra al usuario el archivo con el que está trabajando, el % parcial y el % total de los archivos a procesar.
+8. Muestra información final del proceso, si ha habido errores y demás información relevante.
+9. Pregunta al usuario qué hacer con los archivos originales después de procesarlos (1: Eliminarlos, 2: Moverlos a un directorio "backup", 3: Mantenerlos en su sitio. Por defecto: Moverlos al directorio).
+"""
+
+import os
+import shutil
+import zipfile
+import tarfile
+import tempfile
+import subprocess
+import sys
+import platform
+import logging
+import stat
+import time
+import struct
+import threading
+import zlib
+import lzma
+import math
+import io
+import random
+import hashlib
+import json
+import heapq
+from datetime import datetime
+import importlib.util
+from contextlib import contextmanager
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Configuración del logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Detección del sistema operativo
+OPERATING_SYSTEM = platform.system()
+logging.info(f"Sistema operativo detectado: {OPERATING_SYSTEM}")
+
+# Variables globales para las rutas de RAR
+RAR_PATH_WINDOWS = r"C:\Program Files\WinRAR\Rar.exe"
+RAR_PATH_LINUX = None
+
+# tar.zst solo está disponible si el módulo opcional zstandard está instalado
+ZSTD_AVAILABLE = importlib.util.find_spec('zstandard') is not None
+ARCHIVE_FORMATS = ('tar.gz', 'tar.xz', 'tar.zst', 'zip', '7z', 'rar')
+TAR_FORMATS = ('tar.gz', 'tar.xz', 'tar.zst')
+
+# Formatos que se pueden recomprimir en streaming (miembro a miembro, sin directorio temporal)
+STREAMABLE_FORMATS = ('zip',) + TAR_FORMATS
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+# Procesamiento en paralelo: zlib/LZMA trabajan en C y liberan el GIL, así que bastan hilos
+DEFAULT_WORKERS = os.cpu_count() or 2
+SCRATCH_SAFETY_MARGIN = 0.10  # Parte del espacio libre que nunca se reserva para temporales
+UNKNOWN_EXPANSION_RATIO = 3   # Estimación de tamaño descomprimido cuando el archivo no lo declara
+
+# Compresión en paralelo: un solo pool de hilos para todos los escritores (zip, tar.gz, tar.xz) de
+# todos los trabajos, y un solo tope de bytes sin comprimir esperando en memoria en los escritores ZIP
+COMPRESSION_THREADS = DEFAULT_WORKERS
+ZSTD_THREADS = COMPRESSION_THREADS  # Hilos propios de cada compresor zstd; run_batch lo reparte entre trabajos
+ZIP_INFLIGHT_BYTES = 256 * 1024 * 1024
+
+# Escritor gzip en paralelo (estilo pigz): tamaño de bloque y diccionario heredado del bloque anterior
+GZIP_BLOCK_SIZE = 128 * 1024
+GZIP_DICT_SIZE = 32 * 1024
+
+# Detección de contenido incompresible (JPEG, MP4, archivos anidados...): se guarda sin comprimir
+STORE_PROBE_BYTES = 256 * 1024   # Muestra del principio de cada miembro que se comprime de prueba
+STORE_ENTROPY_BITS = 7.0         # Por debajo de esta entropía (bits/byte) no hace falta probar
+STORE_MIN_SAVING = 0.03          # Si la muestra no baja al menos un 3%, el miembro va sin comprimir
+GZIP_PROBE_BYTES = 16 * 1024     # En tar.gz la prueba es por bloque y más pequeña
+
+# Archivos pequeños: se recomprimen en memoria, sin directorio temporal (umbral en MB en la variable
+# RECOMPRESION_MEMORIA_MB, 64 por defecto). Los grandes van al directorio temporal, que puede ser
+# un tmpfs o un SSD rápido (variable RECOMPRESION_SCRATCH)
+_memory_mb = os.environ.get('RECOMPRESION_MEMORIA_MB', '')
+MEMORY_STAGING_BYTES = (int(_memory_mb) if _memory_mb.isdigit() else 64) * 1024 * 1024
+MEMORY_STAGING_TOTAL_BYTES = 4 * MEMORY_STAGING_BYTES  # Entre todos los trabajos a la vez
+SCRATCH_DIR = os.environ.get('RECOMPRESION_SCRATCH')
+
+# Benchmark de formatos y niveles: muestra de archivos y niveles (escala 0-10 del programa) a probar
+BENCHMARK_SAMPLE_ARCHIVES = 5
+BENCHMARK_SAMPLE_BYTES = 64 * 1024 * 1024
+BENCHMARK_LEVELS = (1, 5, 9)
+
+# Estimación de ahorro: solo cabeceras más una muestra pequeña de datos de cada archivo
+ESTIMATE_SAMPLE_MEMBERS = 4
+ESTIMATE_SAMPLE_BYTES = 1024 * 1024   # Total de datos de muestra por archivo
+ESTIMATE_LEVEL = 5
+ESTIMATE_TOP = 20                     # Archivos que se listan, ordenados por ahorro absoluto
+ZIP_MEMBER_OVERHEAD = 30 + 46         # Cabecera local + entrada del directorio central (más 2 veces el nombre)
+
+# Extracción de ZIP en paralelo: un ZipFile por hilo, miembros repartidos por tamaño comprimido
+EXTRACT_THREADS = DEFAULT_WORKERS
+
+# Diario de la ejecución: archivos ya terminados (para reanudar) y nombres que la búsqueda ignora
+JOURNAL_FILENAME = ".recompresion_diario.jsonl"
+TEMP_PREFIX = ".recompresion_tmp_"
+BACKUP_DIRNAME = "backup"
+
+# Verificación: manifiesto (una línea JSON por archivo recomprimido) en el directorio de la salida
+MANIFEST_FILENAME = "recompresion_manifiesto.jsonl"
+
+# tar.xz por bloques: cada bloque es un flujo xz independiente y los flujos se concatenan (como xz -T)
+XZ_BLOCK_SIZE = 16 * 1024 * 1024
+
+# Deduplicación entre archivos: cada contenido distinto se guarda una sola vez en un 7z sólido,
+# con un manifiesto que describe cómo era cada archivo original
+DEDUP_FILENAME = "recompresion_dedup.7z"
+DEDUP_MANIFEST_NAME = "manifiesto_dedup.json"
+DEDUP_BLOB_DIR = "blobs"
+
+def find_rar_linux():
+    common_paths = [
+        '/usr/bin/rar',
+        '/usr/local/bin/rar',
+        '/opt/rar/rar',
+        '/usr/share/rar/rar'
+    ]
+    for path in common_paths:
+        if os.path.isfile(path):
+            return path
+    return None
+
+def check_rar_availability():
+    global RAR_PATH_LINUX
+    if OPERATING_SYSTEM == 'Windows':
+        rar_command = RAR_PATH_WINDOWS
+    else:
+        RAR_PATH_LINUX = find_rar_linux()
+        rar_command = RAR_PATH_LINUX or 'rar'
+    
+    if shutil.which(rar_command) is None:
+        logging.warning("No se encontró el comando RAR. La compresión y descompresión en formato RAR no estarán disponibles.")
+        if OPERATING_SYSTEM == 'Windows':
+            logging.warning("Por favor, instala WinRAR y asegúrate de que esté en la ruta: " + RAR_PATH_WINDOWS)
+        else:
+            logging.warning("Por favor, instala el paquete 'rar' en tu sistema Linux.")
+            logging.warning("Puedes hacerlo con: sudo apt-get install rar (para sistemas basados en Debian/Ubuntu)")
+            logging.warning("O busca el paquete equivalente para tu distribución Linux.")
+        return False
+    logging.info(f"RAR encontrado en: {rar_command}")
+    return True
+
+def check_and_install_dependencies():
+    try:
+        import py7zr
+    except ImportError:
+        logging.info("py7zr no está instalado. Instalando...")
+        subprocess.check_call([sys.executable, "-m", "pip", "install", "py7zr"])
+
+    try:
+        import rarfile
+    except ImportError:
+        logging.info("rarfile no está instalado. Instalando...")
+        subprocess.check_call([sys.executable, "-m", "pip", "install", "rarfile"])
+
+def get_compressed_files(directory, journal=None):
+    """
+    Archivos comprimidos del directorio. Se saltan el directorio 'backup', los temporales y
+    salidas a medias del propio programa y, si se pasa el diario, las salidas ya producidas.
+    """
+    compressed_files = []
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = [d for d in dirs if d != BACKUP_DIRNAME and not d.startswith(TEMP_PREFIX)]
+        for file in files:
+            # Solo se saltan los temporales propios: '<x>.part' ya no acaba en una extensión de archivo,
+            # y el de rar es '<x>.part.rar'. Un 'copia.part.2019.zip' sigue siendo un archivo normal.
+            if (file.endswith('.part.rar') or file == DEDUP_FILENAME
+                    or not file.endswith(tuple('.' + format for format in ARCHIVE_FORMATS))):
+                continue
+            path = os.path.join(root, file)
+            if journal is None or not journal.is_output(path):
+                compressed_files.append(path)
+    return compressed_files
+
+class BatchJournal:
+    """
+    Diario de solo añadir con una línea JSON por archivo terminado: original (ruta, tamaño y mtime
+    antes de procesarlo) y salida (ruta, tamaño y SHA-256). Al arrancar se carga en diccionarios,
+    así que saber si un archivo ya está hecho o es una salida propia cuesta O(1).
+    """
+    def __init__(self, directory):
+        self.path = os.path.join(directory, JOURNAL_FILENAME)
+        self.done = {}     # ruta original -> (tamaño, mtime_ns)
+        self.outputs = {}  # ruta de salida -> tamaño
+        self._lock = threading.Lock()
+        if os.path.exists(self.path):
+            with open(self.path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # Última línea a medias de una ejecución interrumpida
+                    self.done[entry['original']] = (entry['tamaño'], entry['mtime_ns'])
+                    self.outputs[entry['salida']] = entry['tamaño_salida']
+
+    def is_done(self, file):
+        """El original ya se procesó y sigue igual (solo ocurre si se eligió mantenerlo)."""
+        recorded = self.done.get(os.path.abspath(file))
+        if recorded is None:
+            return False
+        st = os.stat(file)
+        return recorded == (st.st_size, st.st_mtime_ns)
+
+    def is_output(self, file):
+        """El archivo es una salida de una ejecución anterior (y nadie lo ha cambiado desde entonces)."""
+        size = self.outputs.get(os.path.abspath(file))
+        return size is not None and size == os.path.getsize(file)
+
+    def record(self, original, original_stat, output_path):
+        sha256 = hashlib.sha256()
+        with open(output_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(STREAM_CHUNK_SIZE), b''):
+                sha256.update(chunk)
+        entry = {'original': os.path.abspath(original), 'tamaño': original_stat.st_size,
+                 'mtime_ns': original_stat.st_mtime_ns, 'salida': os.path.abspath(output_path),
+                 'tamaño_salida': os.path.getsize(output_path), 'sha256_salida': sha256.hexdigest(),
+                 'fecha': datetime.now().isoformat(timespec='seconds')}
+        with self._lock:
+            self.done[entry['original']] = (entry['tamaño'], entry['mtime_ns'])
+            self.outputs[entry['salida']] = entry['tamaño_salida']
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+
+def decompress_file(file_path, temp_dir, skipped=None):
+    """
+    Extrae un archivo en temp_dir. Si se pasa skipped, se añaden a esa lista los miembros que no son
+    archivos ni directorios (enlaces, dispositivos...), que la recompresión no conserva.
+    """
+    import py7zr
+    import rarfile
+
+    special = []
+    if file_path.endswith('.zip'):
+        with zipfile.ZipFile(file_path, 'r') as zip_ref:
+            special = [m.filename for m in zip_ref.infolist() if stat.S_ISLNK(m.external_attr >> 16)]
+        extract_zip_parallel(file_path, temp_dir)
+    elif archive_format(file_path) in TAR_FORMATS:
+        with open_tar_input(file_path) as tar_ref:
+            tar_ref.extractall(temp_dir)
+            special = [m.name for m in tar_ref.getmembers() if not (m.isfile() or m.isdir())]
+    elif file_path.endswith('.7z'):
+        with py7zr.SevenZipFile(file_path, mode='r') as seven_zip:
+            special = [e.filename for e in seven_zip.list() if not (e.is_directory or e.is_file)]
+            seven_zip.reset()
+            seven_zip.extractall(temp_dir)
+    elif file_path.endswith('.rar'):
+        if not check_rar_availability():
+            raise ValueError("RAR no está disponible en el sistema. No se puede descomprimir el archivo.")
+        with rarfile.RarFile(file_path, 'r') as rar_ref:
+            special = [e.filename for e in rar_ref.infolist() if e.is_symlink()]
+            rar_ref.extractall(temp_dir)
+    else:
+        raise ValueError(f"Formato de archivo no soportado: {file_path}")
+    if skipped is not None:
+        skipped.extend(special)
+
+def _extract_zip_members(file_path, members, temp_dir):
+    # Cada hilo abre su propio ZipFile: un mismo objeto no se puede leer desde varios hilos
+    with zipfile.ZipFile(file_path, 'r') as zip_ref:
+        return [(member, zip_ref.extract(member, temp_dir)) for member in members]
+
+def extract_zip_parallel(file_path, temp_dir, workers=EXTRACT_THREADS):
+    """
+    Extrae un ZIP descomprimiendo varios miembros a la vez (zlib libera el GIL). Los miembros se
+    reparten entre los hilos por tamaño comprimido, de mayor a menor y siempre al hilo con menos
+    carga, y al final se restauran fechas y permisos (los directorios al final del todo, porque
+    crear archivos dentro les cambia la fecha).
+    """
+    with zipfile.ZipFile(file_path, 'r') as zip_ref:
+        members = zip_ref.infolist()
+    directories = [m for m in members if m.is_dir()]
+    files = sorted((m for m in members if not m.is_dir()), key=lambda m: -m.compress_size)
+
+    buckets = [[] for _ in range(max(1, min(workers, len(files))))]
+    loads = [(0, i) for i in range(len(buckets))]
+    for member in files:
+        load, i = heapq.heappop(loads)
+        buckets[i].append(member)
+        heapq.heappush(loads, (load + member.compress_size, i))
+
+    extracted = []
+    with zipfile.ZipFile(file_path, 'r') as zip_ref:
+        for member in directories:
+            extracted.append((member, zip_ref.extract(member, temp_dir)))
+    with ThreadPoolExecutor(max_workers=len(buckets)) as executor:
+        for result in executor.map(lambda bucket: _extract_zip_members(file_path, bucket, temp_dir), buckets):
+            extracted.extend(result)
+
+    for member, path in sorted(extracted, key=lambda item: item[0].is_dir()):
+        mode = stat.S_IMODE(member.external_attr >> 16)
+        if mode:
+            os.chmod(path, mode)
+        mtime = time.mktime(member.date_time + (0, 0, -1))
+        os.utime(path, (mtime, mtime))
+
+def remove_scratch(path):
+    """
+    Borra un directorio temporal aunque la extracción haya dejado permisos de solo lectura (se
+    restauran los del archivo, por ejemplo un directorio 0o555). Si aun así no se puede, solo avisa:
+    el trabajo ya ha terminado y un temporal que sobra no lo convierte en un error.
+    """
+    def make_writable(func, failed_path, exc_info):
+        parent = os.path.dirname(failed_path)
+        os.chmod(parent, os.stat(parent).st_mode | stat.S_IRWXU)
+        if os.path.isdir(failed_path) and not os.path.islink(failed_path):
+            os.chmod(failed_path, os.stat(failed_path).st_mode | stat.S_IRWXU)
+        func(failed_path)
+
+    try:
+        shutil.rmtree(path, onerror=make_writable)
+    except OSError as e:
+        logging.warning(f"No se pudo borrar el temporal {path}: {e}")
+
+def iter_directory_members(temp_dir):
+    """
+    Recorre un directorio extraído con el mismo formato que iter_archive_members: nombres relativos
+    a temp_dir, así que la salida tiene la misma estructura que si se hubiera recomprimido en memoria.
+    """
+    for root, dirs, files in os.walk(temp_dir):
+        for directory in dirs:
+            path = os.path.join(root, directory)
+            st = os.stat(path)
+            yield {'name': os.path.relpath(path, temp_dir).replace(os.sep, '/'), 'size': 0,
+                   'mtime': st.st_mtime, 'mode': stat.S_IMODE(st.st_mode), 'is_dir': True}, None
+        for file in files:
+            path = os.path.join(root, file)
+            st = os.stat(path)
+            info = {'name': os.path.relpath(path, temp_dir).replace(os.sep, '/'), 'size': st.st_size,
+                    'mtime': st.st_mtime, 'mode': stat.S_IMODE(st.st_mode), 'is_dir': False}
+            with open(path, 'rb') as stream:
+                yield info, stream
+
+def compress_files(temp_dir, output_path, format, compression_level, hashes=None):
+    """
+    Comprime el contenido de un directorio extraído. Los nombres de los miembros son relativos a
+    temp_dir en todos los formatos, igual que al recomprimir en memoria o en streaming.
+    Si se pasa hashes, se rellena con las huellas de cada archivo mientras se comprime.
+    """
+    if format in ('zip', '7z') + TAR_FORMATS:
+        members = iter_directory_members(temp_dir)
+        if hashes is not None:
+            members = hash_members(members, hashes)
+        write_members(members, output_path, format, compression_level)
+    elif format == 'rar':
+        if hashes is not None:
+            # rar lee los archivos por su cuenta: las huellas exigen una lectura aparte
+            hashes.update(hash_directory(temp_dir))
+        if not check_rar_availability():
+            raise ValueError("RAR no está disponible en el sistema. No se puede comprimir en formato RAR.")
+
+        rar_command = RAR_PATH_WINDOWS if OPERATING_SYSTEM == 'Windows' else (RAR_PATH_LINUX or 'rar')
+        names = [os.path.relpath(os.path.join(root, file), temp_dir)
+                 for root, dirs, files in os.walk(temp_dir) for file in files]
+        subprocess.check_call([rar_command, 'a', '-m{}'.format(min(5, compression_level)), os.path.abspath(output_path)] + names,
+                              cwd=temp_dir)
+    else:
+        raise ValueError(f"Formato de compresión no soportado: {format}")
+
+def archive_format(file_path):
+    for format in ARCHIVE_FORMATS:
+        if file_path.endswith('.' + format):
+            return format
+    return None
+
+def _zlib_level(compression_level):
+    # La escala del programa es 0-10; zlib solo acepta 0-9
+    return max(0, min(9, compression_level))
+
+def _xz_preset(compression_level):
+    return max(0, min(9, compression_level))
+
+def _zstd_level(compression_level):
+    # 0-10 del programa sobre 1-19 de zstd (5 -> 10); los niveles 20+ necesitan demasiada memoria
+    return max(1, min(19, compression_level * 2))
+
+@contextmanager
+def open_tar_input(file_path, format=None):
+    """Abre un tar comprimido (gz, xz o zst) para lectura secuencial."""
+    format = format or archive_format(file_path)
+    if format == 'tar.zst':
+        import zstandard
+        with open(file_path, 'rb') as f, zstandard.ZstdDecompressor().stream_reader(f) as reader, \
+                tarfile.open(fileobj=reader, mode='r|') as tar_ref:
+            yield tar_ref
+    elif format == 'tar.xz':
+        # lzma.open admite varios flujos xz concatenados (los que produce ParallelXzWriter o xz -T);
+        # el modo 'r|xz' de tarfile solo lee el primero
+        with lzma.open(file_path, 'rb') as reader, tarfile.open(fileobj=reader, mode='r|') as tar_ref:
+            yield tar_ref
+    else:
+        # Modo 'r|gz': lectura secuencial pura, sin saltos hacia atrás en el archivo
+        with tarfile.open(file_path, 'r|gz') as tar_ref:
+            yield tar_ref
+
+@contextmanager
+def open_tar_output(output_path, format, compression_level):
+    """Abre un tar de salida cuyo compresor trabaja en varios hilos."""
+    if format == 'tar.gz':
+        writer = ParallelGzipWriter(output_path, compression_level)
+    elif format == 'tar.xz':
+        writer = ParallelXzWriter(output_path, compression_level)
+    elif format == 'tar.zst':
+        if not ZSTD_AVAILABLE:
+            raise ValueError("El formato tar.zst necesita el módulo 'zstandard' (pip install zstandard).")
+        import zstandard
+        # zstd usa sus propios hilos, no el pool compartido: cada escritor se queda con su parte
+        compressor = zstandard.ZstdCompressor(level=_zstd_level(compression_level), threads=ZSTD_THREADS)
+        writer = compressor.stream_writer(open(output_path, 'wb'), closefd=True)
+    else:
+        raise ValueError(f"Formato tar no soportado: {format}")
+    with writer, tarfile.open(fileobj=writer, mode='w|') as tar_ref:
+        yield tar_ref
+
+def iter_archive_members(file_path, format=None, skipped=None):
+    """
+    Recorre los miembros de un .zip o .tar comprimido sin extraerlos a disco.
+    Genera tuplas (info, stream): info es un diccionario con name, size, mtime, mode e is_dir;
+    stream es un objeto de lectura del contenido (None para directorios).
+    Los enlaces y miembros especiales se omiten y, si se pasa skipped, se anotan en esa lista.
+    """
+    format = format or archive_format(file_path)
+    if format == 'zip':
+        with zipfile.ZipFile(file_path, 'r') as zip_ref:
+            for member in zip_ref.infolist():
+                unix_mode = member.external_attr >> 16
+                is_dir = member.is_dir()
+                info = {
+                    'name': member.filename.rstrip('/'),
+                    'size': member.file_size,
+                    'mtime': time.mktime(member.date_time + (0, 0, -1)),
+                    'mode': stat.S_IMODE(unix_mode) or (0o755 if is_dir else 0o644),
+                    'is_dir': is_dir,
+                }
+                if stat.S_ISLNK(unix_mode):
+                    logging.warning(f"Enlace simbólico omitido en {file_path}: {member.filename}")
+                    if skipped is not None:
+                        skipped.append(member.filename)
+                    continue
+                if is_dir:
+                    yield info, None
+                    continue
+                with zip_ref.open(member) as stream:
+                    yield info, stream
+    elif format in TAR_FORMATS:
+        with open_tar_input(file_path, format) as tar_ref:
+            for member in tar_ref:
+                info = {'name': member.name, 'size': member.size, 'mtime': member.mtime,
+                        'mode': member.mode, 'is_dir': member.isdir()}
+                if member.isdir():
+                    yield info, None
+                elif member.isfile():
+                    yield info, tar_ref.extractfile(member)
+                else:
+                    logging.warning(f"Miembro especial omitido en {file_path}: {member.name}")
+                    if skipped is not None:
+                        skipped.append(member.name)
+    else:
+        raise ValueError(f"Formato no soportado para recompresión en streaming: {file_path}")
+
+def _zip_member_info(info):
+    """ZipInfo con nombre, fecha y permisos de un miembro (info, stream)."""
+    # ZIP no admite fechas anteriores a 1980
+    date_time = time.localtime(max(info['mtime'], 315532800))[:6]
+    if info['is_dir']:
+        member = zipfile.ZipInfo(info['name'] + '/', date_time)
+        member.external_attr = ((stat.S_IFDIR | info['mode']) << 16) | 0x10
+        return member
+    member = zipfile.ZipInfo(info['name'], date_time)
+    member.external_attr = (stat.S_IFREG | info['mode']) << 16
+    member.compress_type = zipfile.ZIP_DEFLATED
+    member.file_size = info['size']  # Permite decidir Zip64 antes de escribir
+    return member
+
+def byte_entropy(sample):
+    """Entropía de Shannon en bits por byte (8.0 = aleatorio, ya comprimido o cifrado)."""
+    if not sample:
+        return 0.0
+    total = len(sample)
+    return -sum(count / total * math.log2(count / total) for count in Counter(sample).values())
+
+def probe_compressibility(sample, level):
+    """
+    Decide si merece la pena comprimir a partir de una muestra: primero la entropía (barata) y,
+    si es alta, una compresión de prueba al nivel pedido. Devuelve (comprimible, segundos de la prueba).
+    """
+    if level == 0 or byte_entropy(sample[:64 * 1024]) < STORE_ENTROPY_BITS:
+        return True, 0.0
+    start = time.perf_counter()
+    compressed_size = len(zlib.compress(sample, level))
+    return compressed_size < len(sample) * (1 - STORE_MIN_SAVING), time.perf_counter() - start
+
+class CompressionReport:
+    """Estadísticas por tipo de miembro (extensión), compartidas por todos los hilos."""
+    def __init__(self):
+        self.by_type = {}
+        self._lock = threading.Lock()
+
+    def record(self, kind, size_in, size_out, stored, seconds, saved_seconds=0.0):
+        with self._lock:
+            entry = self.by_type.setdefault(kind, {'members': 0, 'stored': 0, 'in': 0, 'out': 0,
+                                                  'seconds': 0.0, 'saved': 0.0})
+            entry['members'] += 1
+            entry['stored'] += int(stored)
+            entry['in'] += size_in
+            entry['out'] += size_out
+            entry['seconds'] += seconds
+            entry['saved'] += saved_seconds
+
+    def log(self):
+        if not self.by_type:
+            return
+        logging.info("Resumen por tipo de miembro (ratio = tamaño final / original):")
+        for kind, e in sorted(self.by_type.items(), key=lambda item: -item[1]['in']):
+            ratio = e['out'] / e['in'] if e['in'] else 1.0
+            logging.info(f"  {kind:<16} {e['members']:>6} miembros, {e['stored']:>6} sin comprimir, "
+                         f"ratio {ratio:.3f}, {e['seconds']:.1f}s de CPU, ~{e['saved']:.1f}s ahorrados")
+
+COMPRESSION_REPORT = CompressionReport()
+
+def member_type(name):
+    return os.path.splitext(name)[1].lower() or '(sin extensión)'
+
+def _deflate(name, data, level):
+    """Comprime un miembro ZIP, o lo deja tal cual si la muestra indica que no va a reducirse."""
+    start = time.perf_counter()
+    crc = zlib.crc32(data)
+    sample = data[:STORE_PROBE_BYTES]
+    compressible, probe_seconds = probe_compressibility(sample, level)
+    if not compressible:
+        # Ahorro estimado: lo que habría costado comprimir el resto al ritmo de la muestra
+        saved = probe_seconds * (len(data) / len(sample) - 1)
+        COMPRESSION_REPORT.record(member_type(name), len(data), len(data), True, time.perf_counter() - start, saved)
+        return data, crc, zipfile.ZIP_STORED
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)  # Deflate crudo, como dentro de un ZIP
+    compressed = compressor.compress(data) + compressor.flush()
+    if len(compressed) >= len(data):
+        # Miembros diminutos o aleatorios que la muestra no delató: tampoco se guardan más grandes
+        COMPRESSION_REPORT.record(member_type(name), len(data), len(data), True, time.perf_counter() - start)
+        return data, crc, zipfile.ZIP_STORED
+    COMPRESSION_REPORT.record(member_type(name), len(data), len(compressed), False, time.perf_counter() - start)
+    return compressed, crc, zipfile.ZIP_DEFLATED
+
+class ByteBudget:
+    """
+    Presupuesto de bytes compartido entre hilos. acquire() espera hasta que haya hueco;
+    un trabajo mayor que todo el presupuesto se deja pasar cuando no hay ningún otro en curso.
+    """
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.used = 0
+        self._cond = threading.Condition()
+
+    def try_acquire(self, amount):
+        """Como acquire(), pero sin esperar: devuelve False si ahora no hay hueco."""
+        with self._cond:
+            if self.used and self.used + amount > self.capacity:
+                return False
+            self.used += amount
+            return True
+
+    def acquire(self, amount):
+        with self._cond:
+            while self.used and self.used + amount > self.capacity:
+                self._cond.wait()
+            self.used += amount
+
+    def release(self, amount):
+        with self._cond:
+            self.used -= amount
+            self._cond.notify_all()
+
+# Compartidos por todos los trabajos de run_batch: la memoria y los hilos de compresión no se
+# multiplican por el número de archivos que se procesan a la vez
+COMPRESSION_POOL = ThreadPoolExecutor(max_workers=COMPRESSION_THREADS, thread_name_prefix='compresion')
+ZIP_INFLIGHT_BUDGET = ByteBudget(ZIP_INFLIGHT_BYTES)
+STAGING_BUDGET = ByteBudget(MEMORY_STAGING_TOTAL_BYTES)
+
+class ParallelZipWriter:
+    """
+    Escribe un ZIP comprimiendo varios miembros a la vez en el pool compartido (zlib libera el GIL).
+    Los miembros se leen a memoria, se comprimen en paralelo y se escriben en su orden original
+    con cabeceras locales y directorio central correctos (zipfile se encarga de este último).
+    Los bytes sin comprimir en memoria se reservan en un presupuesto común a todos los escritores;
+    los miembros que no caben en la mitad de ese presupuesto se comprimen en streaming en el hilo
+    del trabajo.
+    """
+    def __init__(self, output_path, compression_level, pool=COMPRESSION_POOL, budget=ZIP_INFLIGHT_BUDGET):
+        self.level = _zlib_level(compression_level)
+        self.zip = zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED, compresslevel=self.level)
+        self.pool = pool
+        self.budget = budget
+        self.pending = deque()  # (ZipInfo, future, bytes leídos, bytes reservados), en orden de escritura
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def add(self, info, stream):
+        member = _zip_member_info(info)
+        if info['is_dir'] or info['size'] > self.budget.capacity // 2:
+            # Directorios y miembros enormes: se escriben tras los pendientes para mantener el orden
+            self._drain()
+            if info['is_dir']:
+                self.zip.writestr(member, b'')
+            else:
+                self._write_streamed(member, stream)
+            return
+        # Antes de esperar a otros escritores se vacía lo propio: quien retiene presupuesto
+        # siempre puede devolverlo, así que no hay bloqueos cruzados
+        while not self.budget.try_acquire(info['size']):
+            if self.pending:
+                self._write_next()
+            else:
+                self.budget.acquire(info['size'])
+                break
+        try:
+            data = stream.read()
+        except Exception:
+            self.budget.release(info['size'])
+            raise
+        self.pending.append((member, self.pool.submit(_deflate, member.filename, data, self.level), len(data), info['size']))
+
+    def _write_streamed(self, member, stream):
+        start = time.perf_counter()
+        sample = stream.read(STORE_PROBE_BYTES)
+        compressible, probe_seconds = probe_compressibility(sample, self.level)
+        if not compressible:
+            member.compress_type = zipfile.ZIP_STORED
+        with self.zip.open(member, 'w') as dest:
+            dest.write(sample)
+            shutil.copyfileobj(stream, dest, STREAM_CHUNK_SIZE)
+        saved = probe_seconds * (member.file_size / len(sample) - 1) if not compressible else 0.0
+        COMPRESSION_REPORT.record(member_type(member.filename), member.file_size, member.compress_size,
+                                  not compressible, time.perf_counter() - start, saved)
+
+    def _write_next(self):
+        member, future, size, reserved = self.pending.popleft()
+        compressed, crc, compress_type = future.result()
+        member.compress_type = compress_type
+        member.CRC = crc
+        member.compress_size = len(compressed)
+        member.file_size = size
+        member.flag_bits = 0
+        zip64 = member.file_size > zipfile.ZIP64_LIMIT or member.compress_size > zipfile.ZIP64_LIMIT
+        # Mismo procedimiento que ZipFile.open(..., 'w'), pero con los datos ya comprimidos
+        fp = self.zip.fp
+        fp.seek(self.zip.start_dir)
+        member.header_offset = fp.tell()
+        fp.write(member.FileHeader(zip64))
+        fp.write(compressed)
+        self.zip.start_dir = fp.tell()
+        self.zip.filelist.append(member)
+        self.zip.NameToInfo[member.filename] = member
+        self.budget.release(reserved)
+
+    def _drain(self):
+        while self.pending:
+            self._write_next()
+
+    def close(self):
+        try:
+            self._drain()
+        finally:
+            # Tras un error: lo pendiente se cancela y su presupuesto vuelve al fondo común
+            while self.pending:
+                _, future, _, reserved = self.pending.popleft()
+                future.cancel()
+                self.budget.release(reserved)
+            self.zip.close()
+
+def _deflate_block(data, level, zdict, last):
+    start = time.perf_counter()
+    # Bloques incompresibles (tramos de JPEG, vídeo...) se emiten como bloques deflate sin comprimir
+    sample = data[:GZIP_PROBE_BYTES]
+    stored = bool(level and sample and len(zlib.compress(sample, 1)) >= len(sample) * (1 - STORE_MIN_SAVING))
+    if stored:
+        level = 0
+    if zdict:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15, zdict=zdict)
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    # Z_SYNC_FLUSH cierra el bloque en un límite de byte para poder concatenar el siguiente
+    compressed = compressor.compress(data) + compressor.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+    COMPRESSION_REPORT.record('(bloques tar.gz)', len(data), len(compressed), stored, time.perf_counter() - start)
+    return compressed
+
+class ParallelBlockWriter:
+    """
+    Base de los escritores por bloques: acumula lo escrito en bloques de block_size, los
+    comprime en el pool compartido y los escribe en orden. Como mucho hay 2 * workers bloques
+    pendientes por escritor. Las subclases definen _compress_job (qué se ejecuta para cada
+    bloque) y, si lo necesitan, la cabecera y el final del archivo.
+    """
+    block_size = GZIP_BLOCK_SIZE
+
+    def __init__(self, output_path, workers, pool=COMPRESSION_POOL):
+        self.file = open(output_path, 'wb')
+        self.pool = pool
+        self.max_pending = 2 * max(1, workers)
+        self.pending = deque()
+        self.buffer = bytearray()
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def write(self, data):
+        self.buffer += data
+        while len(self.buffer) > self.block_size:
+            # Se guarda siempre un bloque sin enviar: el último puede necesitar un cierre distinto
+            block = bytes(self.buffer[:self.block_size])
+            del self.buffer[:self.block_size]
+            self._submit(block, last=False)
+        return len(data)
+
+    def _submit(self, block, last):
+        while len(self.pending) >= self.max_pending:
+            self.file.write(self.pending.popleft().result())
+        self.pending.append(self.pool.submit(*self._compress_job(block, last)))
+
+    def _compress_job(self, block, last):
+        raise NotImplementedError
+
+    def _write_trailer(self):
+        pass
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self._submit(bytes(self.buffer), last=True)
+            while self.pending:
+                self.file.write(self.pending.popleft().result())
+            self._write_trailer()
+        finally:
+            while self.pending:
+                self.pending.popleft().cancel()
+            self.file.close()
+
+class ParallelGzipWriter(ParallelBlockWriter):
+    """
+    Objeto de escritura que produce un único miembro gzip comprimiendo bloques en paralelo,
+    como pigz. Cada bloque usa como diccionario los últimos 32 KB del anterior, así que la
+    compresión apenas empeora; los bloques se concatenan en orden y el CRC32 y el tamaño del
+    final se calculan sobre el flujo completo. El resultado lo lee cualquier gunzip.
+    """
+    block_size = GZIP_BLOCK_SIZE
+
+    def __init__(self, output_path, compression_level, workers=COMPRESSION_THREADS):
+        super().__init__(output_path, workers)
+        self.level = _zlib_level(compression_level)
+        self.previous = b''
+        self.crc = 0
+        self.size = 0
+        # Cabecera gzip: método deflate, sin nombre, mtime actual, SO desconocido
+        self.file.write(struct.pack('<BBBBIBB', 0x1f, 0x8b, 8, 0, int(time.time()), 0, 255))
+
+    def write(self, data):
+        self.crc = zlib.crc32(data, self.crc)
+        self.size += len(data)
+        return super().write(data)
+
+    def _compress_job(self, block, last):
+        job = (_deflate_block, block, self.level, self.previous, last)
+        self.previous = block[-GZIP_DICT_SIZE:]
+        return job
+
+    def _write_trailer(self):
+        self.file.write(struct.pack('<II', self.crc, self.size & 0xffffffff))
+
+def _xz_block(data, preset):
+    start = time.perf_counter()
+    compressed = lzma.compress(data, format=lzma.FORMAT_XZ, preset=preset)
+    COMPRESSION_REPORT.record('(bloques tar.xz)', len(data), len(compressed), False, time.perf_counter() - start)
+    return compressed
+
+class ParallelXzWriter(ParallelBlockWriter):
+    """
+    tar.xz multihilo: cada bloque de XZ_BLOCK_SIZE se comprime como un flujo xz completo y los
+    flujos se concatenan, algo que el formato permite y que xz, tarfile y lzma leen sin problema.
+    Se pierde un poco de ratio en cada frontera de bloque a cambio de usar todos los núcleos.
+    """
+    block_size = XZ_BLOCK_SIZE
+
+    def __init__(self, output_path, compression_level, workers=COMPRESSION_THREADS):
+        super().__init__(output_path, workers)
+        self.preset = _xz_preset(compression_level)
+        self.blocks = 0
+
+    def _compress_job(self, block, last):
+        self.blocks += 1
+        if last and not block and self.blocks > 1:
+            return (bytes, b'')  # Nada que añadir tras el último bloque lleno
+        return (_xz_block, block, self.preset)
+
+def write_members(members, output_path, format, compression_level):
+    """Escribe en un archivo nuevo los miembros (info, stream) conservando nombres, fechas y permisos."""
+    if format == 'zip':
+        with ParallelZipWriter(output_path, compression_level) as writer:
+            for info, stream in members:
+                writer.add(info, stream)
+    elif format in TAR_FORMATS:
+        with open_tar_output(output_path, format, compression_level) as tar_ref:
+            for info, stream in members:
+                member = tarfile.TarInfo(info['name'])
+                member.mtime = int(info['mtime'])
+                member.mode = info['mode']
+                if info['is_dir']:
+                    member.type = tarfile.DIRTYPE
+                    tar_ref.addfile(member)
+                else:
+                    member.size = info['size']
+                    tar_ref.addfile(member, stream)
+    elif format == '7z':
+        import py7zr
+        with py7zr.SevenZipFile(output_path, 'w', filters=[{"id": py7zr.FILTER_LZMA2, "preset": _xz_preset(compression_level)}]) as seven_zip:
+            for info, stream in members:
+                if not info['is_dir']:  # py7zr crea los directorios intermedios
+                    seven_zip.writef(stream, info['name'])
+    else:
+        raise ValueError(f"Formato no soportado para recompresión en streaming: {format}")
+
+def read_members_into_memory(file_path, skipped=None):
+    """
+    Carga en memoria (BytesIO) todos los miembros de un archivo pequeño, en cualquier formato de
+    entrada. Devuelve una lista de (info, stream) como la de iter_archive_members.
+    """
+    format = archive_format(file_path)
+    if format in STREAMABLE_FORMATS:
+        return [(info, io.BytesIO(stream.read()) if stream is not None else None)
+                for info, stream in iter_archive_members(file_path, skipped=skipped)]
+    members = []
+    if format == '7z':
+        import py7zr
+        with py7zr.SevenZipFile(file_path, mode='r') as seven_zip:
+            entries = seven_zip.list()
+            if hasattr(seven_zip, 'readall'):  # py7zr < 1.0
+                contents = seven_zip.readall()
+            else:
+                from py7zr.io import BytesIOFactory
+                factory = BytesIOFactory(MEMORY_STAGING_BYTES + 1)
+                seven_zip.reset()
+                seven_zip.extractall(factory=factory)
+                contents = factory.products
+        for entry in entries:
+            if not (entry.is_directory or entry.is_file):
+                logging.warning(f"Miembro especial omitido en {file_path}: {entry.filename}")
+                if skipped is not None:
+                    skipped.append(entry.filename)
+                continue
+            info = {'name': entry.filename, 'size': entry.uncompressed,
+                    'mtime': entry.creationtime.timestamp() if entry.creationtime else time.time(),
+                    'mode': 0o755 if entry.is_directory else 0o644, 'is_dir': entry.is_directory}
+            stream = None
+            if not entry.is_directory:
+                # Los objetos de py7zr no son BytesIO reales (py7zr.writef, por ejemplo, los rechaza)
+                stream = contents[entry.filename]
+                stream.seek(0)
+                stream = io.BytesIO(stream.read())
+            members.append((info, stream))
+    elif format == 'rar':
+        import rarfile
+        with rarfile.RarFile(file_path, 'r') as rar_ref:
+            for entry in rar_ref.infolist():
+                if entry.is_symlink():
+                    logging.warning(f"Enlace simbólico omitido en {file_path}: {entry.filename}")
+                    if skipped is not None:
+                        skipped.append(entry.filename)
+                    continue
+                is_dir = entry.is_dir()
+                info = {'name': entry.filename.rstrip('/'), 'size': entry.file_size,
+                        'mtime': time.mktime(entry.date_time + (0, 0, -1)),
+                        'mode': 0o755 if is_dir else 0o644, 'is_dir': is_dir}
+                members.append((info, None if is_dir else io.BytesIO(rar_ref.read(entry))))
+    else:
+        raise ValueError(f"Formato de archivo no soportado: {file_path}")
+    return members
+
+class HashingReader(io.BufferedIOBase):
+    """
+    Envuelve un objeto de lectura y calcula CRC32 y SHA-256 de lo que pasa por él. Es un
+    BufferedIOBase (py7zr.writef solo acepta esos) y deja consultar la posición del original.
+    """
+    def __init__(self, stream):
+        super().__init__()
+        self.stream = stream
+        self.crc = 0
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def read(self, size=-1):
+        data = self.stream.read(size)
+        self.crc = zlib.crc32(data, self.crc)
+        self.sha256.update(data)
+        self.size += len(data)
+        return data
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return self.stream.seekable()
+
+    def tell(self):
+        return self.stream.tell()
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        # Solo para medir (py7zr va al final y vuelve): moverse de verdad rompería las huellas
+        return self.stream.seek(offset, whence)
+
+    def digest(self):
+        return {'size': self.size, 'crc32': self.crc, 'sha256': self.sha256.hexdigest()}
+
+def _digest_bytes(data):
+    return {'size': len(data), 'crc32': zlib.crc32(data), 'sha256': hashlib.sha256(data).hexdigest()}
+
+def hash_members(members, hashes):
+    """
+    Deja pasar los miembros (info, stream) calculando sus huellas por el camino, sin leerlos dos
+    veces. Cada huella se guarda en hashes[nombre] cuando el escritor ha consumido el miembro.
+    """
+    pending = None
+    for info, stream in members:
+        if pending:
+            hashes[pending[0]] = pending[1].digest()
+            pending = None
+        if info['is_dir']:
+            yield info, stream
+        elif isinstance(stream, io.BytesIO):
+            # Ya está en memoria (py7zr, además, solo acepta BytesIO reales)
+            hashes[info['name']] = _digest_bytes(stream.getbuffer())
+            yield info, stream
+        else:
+            reader = HashingReader(stream)
+            pending = (info['name'], reader)
+            yield info, reader
+    if pending:
+        hashes[pending[0]] = pending[1].digest()
+
+def hash_directory(temp_dir):
+    """Huellas de los archivos extraídos en un directorio temporal (modo disco)."""
+    hashes = {}
+    for info, stream in iter_directory_members(temp_dir):
+        if info['is_dir']:
+            continue
+        reader = HashingReader(stream)
+        while reader.read(STREAM_CHUNK_SIZE):
+            pass
+        hashes[info['name']] = reader.digest()
+    return hashes
+
+def read_back_hashes(path, format):
+    """
+    Relee el archivo nuevo en streaming y devuelve sus huellas por miembro. Para 7z y RAR se usan
+    los CRC32 de sus cabeceras después de comprobar con su propio test que los datos los cumplen.
+    """
+    hashes = {}
+    if format in STREAMABLE_FORMATS:
+        for info, stream in iter_archive_members(path, format):
+            if info['is_dir']:
+                continue
+            reader = HashingReader(stream)
+            while reader.read(STREAM_CHUNK_SIZE):
+                pass
+            hashes[info['name']] = reader.digest()
+    elif format == '7z':
+        import py7zr
+        with py7zr.SevenZipFile(path, mode='r') as seven_zip:
+            entries = seven_zip.list()
+            seven_zip.reset()
+            bad = seven_zip.testzip()
+        if bad:
+            raise ValueError(f"El 7z nuevo tiene datos corruptos: {bad}")
+        for entry in entries:
+            if entry.is_file:
+                hashes[entry.filename] = {'size': entry.uncompressed, 'crc32': entry.crc32}
+    elif format == 'rar':
+        import rarfile
+        with rarfile.RarFile(path, 'r') as rar_ref:
+            rar_ref.testrar()
+            for entry in rar_ref.infolist():
+                if not entry.is_dir():
+                    hashes[entry.filename] = {'size': entry.file_size, 'crc32': entry.CRC}
+    return hashes
+
+def compare_hashes(expected, actual):
+    """
+    Lista de diferencias entre las huellas del original y las del archivo nuevo (vacía si coinciden).
+    Se comparan nombre a nombre; el SHA-256 cuando los dos lados lo tienen (7z y RAR solo dan CRC32).
+    """
+    def key(digest):
+        return (digest['size'], digest['crc32'])
+    problems = []
+    for name, digest in expected.items():
+        other = actual.get(name)
+        if other is None:
+            problems.append(f"falta {name}")
+        elif key(other) != key(digest) or other.get('sha256', digest['sha256']) != digest['sha256']:
+            problems.append(f"contenido distinto en {name}")
+    problems.extend(f"sobra {name}" for name in actual.keys() - expected.keys())
+    return problems
+
+_manifest_lock = threading.Lock()
+
+def write_manifest_entry(original, output_path, hashes):
+    """Añade al manifiesto del directorio de salida las huellas verificadas de un archivo."""
+    entry = {'fecha': datetime.now().isoformat(timespec='seconds'), 'original': original, 'salida': output_path,
+             'miembros': [{'nombre': name, **digest} for name, digest in sorted(hashes.items())]}
+    with _manifest_lock:
+        with open(os.path.join(os.path.dirname(output_path) or '.', MANIFEST_FILENAME), 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+def part_path_for(output_path, format):
+    # rar decide por la extensión, así que su temporal tiene que terminar en .rar
+    if format == 'rar':
+        return output_path[:-len('.rar')] + '.part.rar'
+    return output_path + '.part'
+
+def transcode_archive(file_path, output_path, format, compression_level, members=None, hashes=None, skipped=None):
+    """
+    Recomprime leyendo cada miembro del original y escribiéndolo directamente en el nuevo archivo,
+    sin pasar por un directorio temporal. El resultado se escribe en '<salida>.part', que se
+    devuelve para que el llamador lo coloque en su sitio una vez tratado el original.
+    Si se pasan members (por ejemplo, ya cargados en memoria) se usan en lugar de leer el archivo;
+    si se pasa hashes, se rellena con las huellas de cada miembro leído, y si se pasa skipped, con
+    los miembros que no se han podido copiar.
+    """
+    part_path = part_path_for(output_path, format)
+    if members is None:
+        members = iter_archive_members(file_path, skipped=skipped)
+    if hashes is not None:
+        members = hash_members(members, hashes)
+    try:
+        write_members(members, part_path, format, compression_level)
+    except Exception:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+    return part_path
+
+def declared_uncompressed_size(file_path):
+    """
+    Tamaño descomprimido que declara el propio archivo, sin extraerlo: directorio central del ZIP,
+    campo ISIZE del final del gzip, cabeceras de 7z o RAR. Si no se puede leer, se estima.
+    """
+    try:
+        format = archive_format(file_path)
+        if format == 'zip':
+            with zipfile.ZipFile(file_path, 'r') as zip_ref:
+                return sum(member.file_size for member in zip_ref.infolist())
+        if format == 'tar.gz':
+            compressed = os.path.getsize(file_path)
+            with open(file_path, 'rb') as f:
+                f.seek(-4, os.SEEK_END)
+                size = struct.unpack('<I', f.read(4))[0]
+            # ISIZE es el tamaño módulo 2^32, así que no distingue 1 GB de 5 GB. Solo es fiable si el
+            # contenido no puede pasar de 4 GB; si puede, se toma la estimación conservadora cuando
+            # es mayor (un gzip muy comprimible de más de 4 GB puede seguir quedándose corto)
+            while size < compressed:
+                size += 1 << 32
+            if compressed * UNKNOWN_EXPANSION_RATIO >= 1 << 32:
+                size = max(size, compressed * UNKNOWN_EXPANSION_RATIO)
+            return size
+        if format == '7z':
+            import py7zr
+            with py7zr.SevenZipFile(file_path, mode='r') as seven_zip:
+                return seven_zip.archiveinfo().uncompressed
+        if format == 'rar':
+            import rarfile
+            with rarfile.RarFile(file_path, 'r') as rar_ref:
+                return sum(member.file_size for member in rar_ref.infolist())
+    except Exception as e:
+        logging.warning(f"No se pudo leer el tamaño descomprimido de {file_path}: {e}")
+    return os.path.getsize(file_path) * UNKNOWN_EXPANSION_RATIO
+
+def set_memory_staging_limit(limit):
+    """Cambia el umbral de recompresión en memoria y, con él, el tope común de RAM de los trabajos."""
+    global MEMORY_STAGING_BYTES, MEMORY_STAGING_TOTAL_BYTES
+    MEMORY_STAGING_BYTES = limit
+    MEMORY_STAGING_TOTAL_BYTES = 4 * limit
+    STAGING_BUDGET.capacity = MEMORY_STAGING_TOTAL_BYTES
+
+def output_path_for(file, format):
+    base_name = os.path.splitext(file)[0]
+    if archive_format(file) in TAR_FORMATS:
+        base_name = os.path.splitext(base_name)[0]  # Remove .tar part
+    return base_name + '.' + format
+
+def staging_mode(file, recompression_format):
+    """
+    Cómo se recomprime un archivo: 'streaming' (miembro a miembro entre formatos que lo permiten),
+    'memoria' (archivos pequeños según el tamaño que declaran) o 'disco' (directorio temporal).
+    Devuelve (modo, tamaño descomprimido declarado).
+    """
+    if archive_format(file) in STREAMABLE_FORMATS and recompression_format in STREAMABLE_FORMATS:
+        return 'streaming', None
+    size = declared_uncompressed_size(file)
+    # RAR solo comprime archivos en disco, así que para esa salida siempre hace falta el temporal
+    if recompression_format != 'rar' and size <= MEMORY_STAGING_BYTES:
+        return 'memoria', size
+    return 'disco', size
+
+def recompress_archive(file, recompression_format, compression_level, original_action, backup_dir, temp_root, mode=None):
+    """
+    Recomprime un archivo en streaming, en memoria o, si es grande, con un temporal propio.
+    Mientras se escribe se calculan las huellas de cada miembro; el archivo nuevo se relee y solo
+    si coincide se anota en el manifiesto y se retira el original.
+    """
+    output_path = output_path_for(file, recompression_format)
+    part_path = part_path_for(output_path, recompression_format)
+    if mode is None:
+        mode = staging_mode(file, recompression_format)[0]
+    expected = {}
+    skipped = []  # Enlaces y miembros especiales que el archivo nuevo no llevaría
+    temp_dir = None
+    try:
+        if mode in ('streaming', 'memoria'):
+            # Ni extracción a disco ni directorio temporal
+            members = read_members_into_memory(file, skipped) if mode == 'memoria' else None
+            transcode_archive(file, output_path, recompression_format, compression_level, members, expected, skipped)
+        else:
+            temp_dir = tempfile.mkdtemp(dir=temp_root)
+            decompress_file(file, temp_dir, skipped)
+            compress_files(temp_dir, part_path, recompression_format, compression_level, expected)
+        problems = [f"no se conserva {name}" for name in skipped]
+        problems += compare_hashes(expected, read_back_hashes(part_path, recompression_format))
+        if problems:
+            raise ValueError("La verificación del archivo nuevo ha fallado: " + "; ".join(problems[:5]))
+        write_manifest_entry(file, output_path, expected)
+        # El original se retira antes de colocar la salida: pueden compartir nombre (zip -> zip)
+        handle_original_files(file, original_action, backup_dir)
+        os.replace(part_path, output_path)
+    except Exception as e:
+        if os.path.exists(part_path):
+            if os.path.exists(file):
+                os.remove(part_path)
+            else:
+                # El original ya no está: el temporal verificado es la única copia y se queda
+                raise RuntimeError(f"El original ya se ha retirado; la salida verificada está en {part_path}: {e}") from e
+        raise
+    finally:
+        if temp_dir:
+            remove_scratch(temp_dir)
+    return output_path
+
+def scratch_need(file, mode, declared_size, temp_root):
+    """
+    Bytes que un trabajo ocupará a la vez en el disco temporal: la extracción si va a disco y,
+    si el temporal está en el mismo disco que el archivo, también la salida.
+    """
+    need = declared_size if mode == 'disco' else 0
+    if os.stat(file).st_dev == os.stat(temp_root).st_dev:
+        need += os.path.getsize(file)
+    return need
+
+def run_batch(compressed_files, recompression_format, compression_level, original_action,
+              backup_dir, temp_root, workers=DEFAULT_WORKERS, journal=None):
+    """
+    Recomprime varios archivos a la vez. La concurrencia la limitan el número de hilos y el
+    espacio libre del disco temporal: cada trabajo reserva lo que va a ocupar antes de empezar.
+    Cada archivo terminado se anota en el diario, si se pasa uno.
+    Devuelve (procesados, lista de (archivo, error)).
+    """
+    global ZSTD_THREADS
+    # Con varios trabajos a la vez, los escritores zstd se reparten los núcleos en vez de pedirlos todos
+    ZSTD_THREADS = max(1, COMPRESSION_THREADS // max(1, workers))
+    usage = shutil.disk_usage(temp_root)
+    budget = ByteBudget(max(0, usage.free - SCRATCH_SAFETY_MARGIN * usage.total))
+    total_files = len(compressed_files)
+    lock = threading.Lock()
+    state = {'processed': 0, 'finished': 0}
+    errors = []
+
+    def job(file):
+        mode, declared_size = staging_mode(file, recompression_format)
+        need = scratch_need(file, mode, declared_size, temp_root)
+        # Los archivos que se recomprimen en memoria comparten un mismo tope de RAM
+        staged = declared_size if mode == 'memoria' else 0
+        budget.acquire(need)
+        STAGING_BUDGET.acquire(staged)
+        try:
+            logging.info(f"Procesando archivo ({mode}): {file}")
+            original_stat = os.stat(file)
+            output_path = recompress_archive(file, recompression_format, compression_level, original_action,
+                                             backup_dir, temp_root, mode)
+            if journal is not None:
+                journal.record(file, original_stat, output_path)
+            return True
+        finally:
+            STAGING_BUDGET.release(staged)
+            budget.release(need)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {executor.submit(job, file): file for file in compressed_files}
+        for future in as_completed(futures):
+            file = futures[future]
+            with lock:
+                state['finished'] += 1
+                try:
+                    future.result()
+                    state['processed'] += 1
+                except Exception as e:
+                    errors.append((file, str(e)))
+                    logging.error(f"Error procesando {file}: {str(e)}")
+                logging.info(f"Progreso: {state['finished']}/{total_files} archivos terminados, "
+                             f"{state['processed']} correctos ({(state['finished']/total_files) * 100:.2f}%)")
+    return state['processed'], errors
+
+def build_benchmark_corpus(compressed_files):
+    """
+    Toma una muestra aleatoria de archivos y la carga en memoria: devuelve (miembros, tar), con la
+    lista de contenidos de cada miembro (para probar ZIP, que comprime miembro a miembro) y los
+    mismos datos empaquetados en un tar sin comprimir (para los formatos tar.* y 7z).
+    """
+    sample = random.sample(compressed_files, min(BENCHMARK_SAMPLE_ARCHIVES, len(compressed_files)))
+    contents, total = [], 0
+    tar_buffer = io.BytesIO()
+    with tarfile.open(fileobj=tar_buffer, mode='w') as tar_ref:
+        for file in sample:
+            remaining = BENCHMARK_SAMPLE_BYTES - total
+            if remaining <= 0:
+                break
+            try:
+                if archive_format(file) in STREAMABLE_FORMATS:
+                    # zip y tar se leen en streaming: de cada miembro solo lo que cabe en la muestra
+                    members = iter_archive_members(file)
+                elif declared_uncompressed_size(file) <= remaining:
+                    members = read_members_into_memory(file)
+                else:
+                    # 7z sólido y RAR se descomprimen enteros: si no caben en la muestra, se saltan
+                    logging.info(f"Se omite {file} en el benchmark: es demasiado grande para leerlo en memoria.")
+                    continue
+                for info, stream in members:
+                    if info['is_dir']:
+                        continue
+                    data = stream.read(BENCHMARK_SAMPLE_BYTES - total)
+                    total += len(data)
+                    contents.append(data)
+                    member = tarfile.TarInfo(f"{len(contents)}/{info['name']}")
+                    member.size = len(data)
+                    tar_ref.addfile(member, io.BytesIO(data))
+                    if total >= BENCHMARK_SAMPLE_BYTES:
+                        break
+            except Exception as e:
+                logging.warning(f"No se pudo leer {file} para el benchmark: {e}")
+    return contents, tar_buffer.getvalue()
+
+def _deflate_raw(data, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush()
+
+def benchmark_codecs(levels=BENCHMARK_LEVELS):
+    """
+    Candidatos del benchmark: (formato, nivel del programa, comprimir, descomprimir).
+    7z se mide con LZMA2 en un contenedor xz, que es el mismo códec que usa py7zr.
+    """
+    def deflate_members(contents, level):
+        return [_deflate_raw(data, level) for data in contents]
+
+    def inflate_members(compressed):
+        return [zlib.decompress(data, -15) for data in compressed]
+
+    codecs = []
+    for level in levels:
+        codecs.append(('zip', level, lambda corpus, lv=_zlib_level(level): deflate_members(corpus[0], lv), inflate_members))
+        codecs.append(('tar.gz', level, lambda corpus, lv=_zlib_level(level): zlib.compress(corpus[1], lv), zlib.decompress))
+        codecs.append(('7z', level, lambda corpus, lv=_xz_preset(level): lzma.compress(corpus[1], preset=lv), lzma.decompress))
+        codecs.append(('tar.xz', level, lambda corpus, lv=_xz_preset(level): lzma.compress(corpus[1], preset=lv), lzma.decompress))
+        if ZSTD_AVAILABLE:
+            import zstandard
+            codecs.append(('tar.zst', level,
+                           lambda corpus, lv=_zstd_level(level): zstandard.ZstdCompressor(level=lv).compress(corpus[1]),
+                           lambda data: zstandard.ZstdDecompressor().decompress(data)))
+    return codecs
+
+def run_benchmark(corpus):
+    """Mide ratio, MB/s al comprimir y MB/s al descomprimir de cada candidato (en un solo núcleo)."""
+    size = len(corpus[1]) or 1
+    results = []
+    for format, level, compress, decompress in benchmark_codecs():
+        start = time.perf_counter()
+        compressed = compress(corpus)
+        compress_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        decompress(compressed)
+        decompress_seconds = time.perf_counter() - start
+        compressed_size = sum(map(len, compressed)) if isinstance(compressed, list) else len(compressed)
+        results.append({'format': format, 'level': level, 'ratio': compressed_size / size,
+                        'compress_mbs': size / 1e6 / max(compress_seconds, 1e-9),
+                        'decompress_mbs': size / 1e6 / max(decompress_seconds, 1e-9)})
+    return results
+
+def pareto_front(results):
+    """Candidatos que ningún otro supera a la vez en ratio y en velocidad de compresión."""
+    return [r for r in results
+            if not any(o['ratio'] <= r['ratio'] and o['compress_mbs'] >= r['compress_mbs'] and
+                       (o['ratio'] < r['ratio'] or o['compress_mbs'] > r['compress_mbs']) for o in results)]
+
+def recommend(results, budget, value):
+    """
+    Recomendación dentro del frente de Pareto. budget 'tiempo': el que más comprime sin bajar de
+    value MB/s. budget 'tamaño': el más rápido sin pasar de un ratio value.
+    """
+    front = pareto_front(results)
+    if budget == 'tiempo':
+        valid = [r for r in front if r['compress_mbs'] >= value]
+        return min(valid, key=lambda r: r['ratio']) if valid else max(front, key=lambda r: r['compress_mbs'])
+    valid = [r for r in front if r['ratio'] <= value]
+    return max(valid, key=lambda r: r['compress_mbs']) if valid else min(front, key=lambda r: r['ratio'])
+
+def ask_positive_float(prompt, default):
+    """Pide un número positivo hasta que la respuesta sea válida; vacío devuelve default."""
+    while True:
+        answer = input(prompt).strip().replace(',', '.')
+        if not answer:
+            return default
+        try:
+            value = float(answer)
+        except ValueError:
+            value = None
+        if value is not None and value > 0 and math.isfinite(value):
+            return value
+        logging.warning(f"'{answer}' no es un número positivo válido. Inténtalo de nuevo.")
+
+def run_benchmark_mode(compressed_files):
+    if not compressed_files:
+        logging.warning("No hay archivos para el benchmark.")
+        return
+    corpus = build_benchmark_corpus(compressed_files)
+    logging.info(f"Benchmark sobre {len(corpus[0])} miembros ({len(corpus[1]) / 1e6:.1f} MB) "
+                 f"de {min(BENCHMARK_SAMPLE_ARCHIVES, len(compressed_files))} archivos.")
+    results = run_benchmark(corpus)
+    front = pareto_front(results)
+    logging.info(f"{'Formato':<8} {'Nivel':>5} {'Ratio':>7} {'Comp. MB/s':>11} {'Desc. MB/s':>11}")
+    for r in sorted(results, key=lambda r: r['ratio']):
+        mark = '  *' if r in front else ''
+        logging.info(f"{r['format']:<8} {r['level']:>5} {r['ratio']:>7.3f} {r['compress_mbs']:>11.1f} "
+                     f"{r['decompress_mbs']:>11.1f}{mark}")
+    logging.info("* = óptimo de Pareto (ninguno comprime más y más rápido a la vez). Velocidades por núcleo.")
+
+    budget_option = input("¿Qué presupuesto quieres fijar? (1: Tiempo, velocidad mínima en MB/s, 2: Tamaño, ratio máximo. Por defecto: 1): ")
+    if budget_option == '2':
+        budget, value = 'tamaño', ask_positive_float("Ratio máximo aceptable (por ejemplo 0.5): ", 0.5)
+    else:
+        budget, value = 'tiempo', ask_positive_float("Velocidad de compresión mínima en MB/s por núcleo (por defecto 20): ", 20.0)
+    best = recommend(results, budget, value)
+    logging.info(f"Recomendación: formato {best['format']} con nivel {best['level']} "
+                 f"(ratio {best['ratio']:.3f}, {best['compress_mbs']:.1f} MB/s)")
+
+def sample_archive(file_path):
+    """
+    Lee solo el índice de un archivo (directorio central del ZIP, cabeceras tar, cabeceras de 7z o
+    RAR) y una muestra aleatoria pequeña de datos. Devuelve (miembros, tamaño descomprimido,
+    longitud total de los nombres, trozos de muestra).
+    """
+    format = archive_format(file_path)
+    per_member = ESTIMATE_SAMPLE_BYTES // ESTIMATE_SAMPLE_MEMBERS
+    chunks = []
+    if format == 'zip':
+        with zipfile.ZipFile(file_path, 'r') as zip_ref:
+            entries = [m for m in zip_ref.infolist() if not m.is_dir()]
+            for member in random.sample(entries, min(ESTIMATE_SAMPLE_MEMBERS, len(entries))):
+                with zip_ref.open(member) as stream:
+                    chunks.append(stream.read(per_member))
+        return len(entries), sum(m.file_size for m in entries), sum(len(m.filename) for m in entries), chunks
+    if format in TAR_FORMATS:
+        # Un tar no tiene índice: se recorren las cabeceras en streaming y la muestra se elige
+        # por muestreo de reserva, leyendo datos solo de los miembros que entran en ella
+        count = total = names = 0
+        with open_tar_input(file_path) as tar_ref:
+            for member in tar_ref:
+                if not member.isfile():
+                    continue
+                count += 1
+                total += member.size
+                names += len(member.name)
+                slot = len(chunks) if len(chunks) < ESTIMATE_SAMPLE_MEMBERS else random.randrange(count)
+                if slot < ESTIMATE_SAMPLE_MEMBERS:
+                    data = tar_ref.extractfile(member).read(per_member)
+                    if slot == len(chunks):
+                        chunks.append(data)
+                    else:
+                        chunks[slot] = data
+        return count, total, names, chunks
+    if format == '7z':
+        import py7zr
+        with py7zr.SevenZipFile(file_path, mode='r') as seven_zip:
+            entries = [e for e in seven_zip.list() if e.is_file]
+    elif format == 'rar':
+        import rarfile
+        with rarfile.RarFile(file_path, 'r') as rar_ref:
+            entries = [e for e in rar_ref.infolist() if not e.is_dir()]
+    else:
+        raise ValueError(f"Formato de archivo no soportado: {file_path}")
+    sizes = [getattr(e, 'uncompressed', None) or getattr(e, 'file_size', 0) for e in entries]
+    names = sum(len(e.filename) for e in entries)
+    # 7z sólido y RAR no permiten leer un miembro suelto barato: solo se muestrean si son pequeños
+    if sum(sizes) <= MEMORY_STAGING_BYTES:
+        members = [stream for info, stream in read_members_into_memory(file_path) if not info['is_dir']]
+        for stream in random.sample(members, min(ESTIMATE_SAMPLE_MEMBERS, len(members))):
+            chunks.append(stream.read(per_member))
+    return len(entries), sum(sizes), names, chunks
+
+def estimate_ratios(chunks, level=ESTIMATE_LEVEL):
+    """Ratio (comprimido / original) de la muestra con el códec de cada formato de destino."""
+    corpus = (chunks, b''.join(chunks))
+    size = len(corpus[1])
+    ratios = {}
+    for format, _, compress, _ in benchmark_codecs(levels=(level,)):
+        compressed = compress(corpus)
+        ratios[format] = (sum(map(len, compressed)) if isinstance(compressed, list) else len(compressed)) / size
+    return ratios
+
+def estimate_savings(compressed_files, level=ESTIMATE_LEVEL):
+    """
+    Estima, sin extraer nada, el tamaño de cada archivo en cada formato de destino. Los archivos sin
+    muestra (7z o RAR grandes) usan el ratio medio del resto de la colección.
+    """
+    rows, pending = [], []
+    totals = {}
+    for file in compressed_files:
+        try:
+            count, uncompressed, names, chunks = sample_archive(file)
+        except Exception as e:
+            logging.warning(f"No se pudo analizar {file}: {e}")
+            continue
+        row = {'file': file, 'size': os.path.getsize(file), 'members': count,
+               'uncompressed': uncompressed, 'names': names, 'ratios': None}
+        if any(chunks):
+            row['ratios'] = estimate_ratios([c for c in chunks if c], level)
+            for format, ratio in row['ratios'].items():
+                totals.setdefault(format, []).append(ratio)
+        else:
+            pending.append(row)
+        rows.append(row)
+    average = {format: sum(values) / len(values) for format, values in totals.items()}
+    for row in pending:
+        row['ratios'] = average
+    for row in rows:
+        row['estimates'] = {}
+        for format, ratio in (row['ratios'] or {}).items():
+            estimate = row['uncompressed'] * ratio
+            if format == 'zip':
+                estimate += row['members'] * ZIP_MEMBER_OVERHEAD + 2 * row['names']
+            row['estimates'][format] = int(estimate)
+        best = min(row['estimates'].items(), key=lambda item: item[1], default=(None, row['size']))
+        row['best_format'], row['best_size'] = best
+        row['saving'] = row['size'] - best[1]
+    return sorted(rows, key=lambda row: -row['saving'])
+
+def run_estimate_mode(compressed_files):
+    if not compressed_files:
+        logging.warning("No hay archivos que analizar.")
+        return
+    rows = estimate_savings(compressed_files)
+    current = sum(row['size'] for row in rows)
+    logging.info(f"Tamaño actual de {len(rows)} archivos: {current / 1e6:.1f} MB (nivel {ESTIMATE_LEVEL}, estimación por muestra)")
+    formats = sorted({format for row in rows for format in row['estimates']})
+    for format in formats:
+        # Cada archivo se queda como está si el formato nuevo no lo mejora
+        total = sum(min(row['size'], row['estimates'].get(format, row['size'])) for row in rows)
+        logging.info(f"  {format:<8} -> {total / 1e6:>10.1f} MB (ahorro {(current - total) / 1e6:.1f} MB)")
+    logging.info(f"Archivos con más ahorro estimado (los {ESTIMATE_TOP} primeros):")
+    for row in rows[:ESTIMATE_TOP]:
+        if row['saving'] <= 0:
+            break
+        logging.info(f"  {row['saving'] / 1e6:>9.1f} MB  {row['best_format']:<8} "
+                     f"{row['size'] / 1e6:.1f} -> {row['best_size'] / 1e6:.1f} MB  {row['file']}")
+
+def iter_any_members(file_path, temp_dir, skipped=None):
+    """
+    Miembros (info, stream) de un archivo en cualquier formato: zip y tar en streaming, 7z y RAR
+    extrayéndolos antes en temp_dir.
+    """
+    if archive_format(file_path) in STREAMABLE_FORMATS:
+        yield from iter_archive_members(file_path, skipped=skipped)
+    else:
+        decompress_file(file_path, temp_dir, skipped)
+        yield from iter_directory_members(temp_dir)
+
+def build_dedup_archive(compressed_files, directory, output_path, compression_level, temp_root):
+    """
+    Calcula el SHA-256 de todos los miembros de todos los archivos y escribe cada contenido distinto
+    una sola vez en un 7z sólido (blobs/<sha256>), junto con un manifiesto JSON con la estructura de
+    cada archivo original (nombres, fechas, permisos y huella de cada miembro). Los contenidos se
+    agrupan por extensión para que los parecidos queden juntos en el bloque sólido.
+    Devuelve un diccionario con el resumen y la lista de (archivo, error).
+    """
+    import py7zr
+    blob_dir = tempfile.mkdtemp(prefix='blobs_', dir=temp_root)
+    blobs = {}  # sha256 -> (extensión del primer miembro, tamaño)
+    layouts, errors = [], []
+    total_members = total_bytes = 0
+    for index, file in enumerate(compressed_files, 1):
+        logging.info(f"Analizando {index}/{len(compressed_files)}: {file}")
+        members, skipped = [], []
+        added = {}  # Contenidos nuevos de este archivo: solo pasan a blobs si el archivo se acepta
+        extract_dir = tempfile.mkdtemp(prefix='extraccion_', dir=temp_root)
+        try:
+            for info, stream in iter_any_members(file, extract_dir, skipped):
+                entry = {'nombre': info['name'], 'mtime': info['mtime'], 'modo': info['mode'], 'es_dir': info['is_dir']}
+                if not info['is_dir']:
+                    reader = HashingReader(stream)
+                    spool_path = os.path.join(blob_dir, f"spool_{index}")
+                    with open(spool_path, 'wb') as spool:
+                        shutil.copyfileobj(reader, spool, STREAM_CHUNK_SIZE)
+                    digest = reader.digest()
+                    if digest['sha256'] in blobs or digest['sha256'] in added:
+                        os.remove(spool_path)
+                    else:
+                        os.replace(spool_path, os.path.join(blob_dir, digest['sha256']))
+                        added[digest['sha256']] = (os.path.splitext(info['name'])[1].lower(), digest['size'])
+                    entry.update({'tamaño': digest['size'], 'sha256': digest['sha256']})
+                members.append(entry)
+            if skipped:
+                raise ValueError("no se podría reconstruir entero, tiene enlaces o miembros especiales: "
+                                 + ", ".join(skipped[:5]))
+        except Exception as e:
+            logging.error(f"Error al analizar {file}: {e}")
+            errors.append((file, str(e)))
+            for sha256 in added:
+                os.remove(os.path.join(blob_dir, sha256))  # Sin archivo que los use serían huérfanos
+            continue
+        finally:
+            remove_scratch(extract_dir)
+        blobs.update(added)
+        sizes = [entry['tamaño'] for entry in members if not entry['es_dir']]
+        total_members += len(sizes)
+        total_bytes += sum(sizes)
+        layouts.append({'archivo': os.path.relpath(file, directory).replace(os.sep, '/'),
+                        'formato': archive_format(file), 'tamaño': os.path.getsize(file), 'miembros': members})
+
+    manifest = {'fecha': datetime.now().isoformat(timespec='seconds'), 'archivos': layouts}
+    part_path = part_path_for(output_path, '7z')
+    with py7zr.SevenZipFile(part_path, 'w', filters=[{"id": py7zr.FILTER_LZMA2, "preset": _xz_preset(compression_level)}]) as seven_zip:
+        for sha256, _ in sorted(blobs.items(), key=lambda item: item[1]):
+            seven_zip.write(os.path.join(blob_dir, sha256), f"{DEDUP_BLOB_DIR}/{sha256}")
+        seven_zip.writef(io.BytesIO(json.dumps(manifest, ensure_ascii=False).encode('utf-8')), DEDUP_MANIFEST_NAME)
+    os.replace(part_path, output_path)
+    shutil.rmtree(blob_dir, ignore_errors=True)
+    summary = {'archivos': len(layouts), 'miembros': total_members, 'bytes': total_bytes,
+               'unicos': len(blobs), 'bytes_unicos': sum(size for _, size in blobs.values()),
+               'originales': sum(layout['tamaño'] for layout in layouts), 'salida': os.path.getsize(output_path)}
+    return summary, errors
+
+def restore_dedup_archive(dedup_path, output_dir, compression_level=5, temp_root=None):
+    """
+    Reconstruye en output_dir los archivos descritos en el manifiesto de un 7z deduplicado, con sus
+    rutas, formatos, nombres de miembro, fechas y permisos. El contenido de cada miembro se comprueba
+    con su SHA-256; los bytes del archivo contenedor no tienen por qué coincidir con el original.
+    Devuelve la lista de rutas reconstruidas.
+    """
+    import py7zr
+    os.makedirs(output_dir, exist_ok=True)
+    work_dir = tempfile.mkdtemp(prefix=TEMP_PREFIX, dir=temp_root or output_dir)
+    try:
+        with py7zr.SevenZipFile(dedup_path, mode='r') as seven_zip:
+            seven_zip.extractall(work_dir)
+        with open(os.path.join(work_dir, DEDUP_MANIFEST_NAME), encoding='utf-8') as f:
+            manifest = json.load(f)
+        blob_dir = os.path.join(work_dir, DEDUP_BLOB_DIR)
+        restored = []
+        verified = set()  # Cada contenido se comprueba una vez, aunque lo usen muchos miembros
+        for layout in manifest['archivos']:
+            output_path = os.path.join(output_dir, *layout['archivo'].split('/'))
+            format = layout['formato']
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            for entry in layout['miembros']:
+                if not entry['es_dir'] and entry['sha256'] not in verified:
+                    blob_path = os.path.join(blob_dir, entry['sha256'])
+                    with open(blob_path, 'rb') as stream:
+                        reader = HashingReader(stream)
+                        while reader.read(STREAM_CHUNK_SIZE):
+                            pass
+                    if reader.digest()['sha256'] != entry['sha256']:
+                        raise ValueError(f"Contenido corrupto en el 7z deduplicado: {entry['sha256']}")
+                    verified.add(entry['sha256'])
+            if format == 'rar':
+                restore_rar_layout(layout, blob_dir, output_path, compression_level, work_dir)
+            else:
+                write_members(_dedup_members(layout, blob_dir), output_path, format, compression_level)
+            restored.append(output_path)
+            logging.info(f"Reconstruido: {output_path}")
+        return restored
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def _dedup_members(layout, blob_dir):
+    for entry in layout['miembros']:
+        info = {'name': entry['nombre'], 'size': entry.get('tamaño', 0), 'mtime': entry['mtime'],
+                'mode': entry['modo'], 'is_dir': entry['es_dir']}
+        if info['is_dir']:
+            yield info, None
+        else:
+            with open(os.path.join(blob_dir, entry['sha256']), 'rb') as stream:
+                yield info, stream
+
+def restore_rar_layout(layout, blob_dir, output_path, compression_level, work_dir):
+    # RAR solo se escribe con el programa externo: se monta el árbol y se comprime con rutas relativas
+    if not check_rar_availability():
+        raise ValueError("RAR no está disponible en el sistema. No se puede reconstruir el archivo RAR.")
+    tree_dir = tempfile.mkdtemp(prefix='rar_', dir=work_dir)
+    names = []
+    for entry in layout['miembros']:
+        path = os.path.join(tree_dir, *entry['nombre'].split('/'))
+        if entry['es_dir']:
+            os.makedirs(path, exist_ok=True)
+            continue
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        shutil.copyfile(os.path.join(blob_dir, entry['sha256']), path)
+        os.chmod(path, entry['modo'])
+        os.utime(path, (entry['mtime'], entry['mtime']))
+        names.append(entry['nombre'])
+    rar_command = RAR_PATH_WINDOWS if OPERATING_SYSTEM == 'Windows' else (RAR_PATH_LINUX or 'rar')
+    subprocess.check_call([rar_command, 'a', '-m{}'.format(min(5, compression_level)), os.path.abspath(output_path)] + names,
+                          cwd=tree_dir)
+
+def run_dedup_mode(compressed_files, directory):
+    if not compressed_files:
+        logging.warning("No hay archivos que deduplicar.")
+        return
+    output_path = input(f"Ruta del 7z deduplicado (por defecto {os.path.join(directory, DEDUP_FILENAME)}): ")
+    output_path = output_path or os.path.join(directory, DEDUP_FILENAME)
+    compression_level = input("Introduce el nivel de compresión (0-10, por defecto 5): ")
+    compression_level = int(compression_level) if compression_level else 5
+    temp_root = tempfile.mkdtemp(prefix=TEMP_PREFIX, dir=SCRATCH_DIR or directory)
+    try:
+        summary, errors = build_dedup_archive(compressed_files, directory, output_path, compression_level, temp_root)
+    finally:
+        remove_scratch(temp_root)
+    logging.info(f"{summary['miembros']} miembros ({summary['bytes'] / 1e6:.1f} MB) de {summary['archivos']} archivos; "
+                 f"{summary['unicos']} contenidos distintos ({summary['bytes_unicos'] / 1e6:.1f} MB)")
+    logging.info(f"Tamaño de los originales: {summary['originales'] / 1e6:.1f} MB -> 7z deduplicado: "
+                 f"{summary['salida'] / 1e6:.1f} MB ({output_path})")
+    logging.info("Los originales no se han tocado. Para reconstruirlos usa la opción 5 con este 7z.")
+    for file, error in errors:
+        logging.warning(f"  {file}: {error}")
+
+def run_restore_mode():
+    dedup_path = input("Ruta del 7z deduplicado: ")
+    output_dir = input("Directorio donde reconstruir los archivos: ")
+    compression_level = input("Introduce el nivel de compresión (0-10, por defecto 5): ")
+    compression_level = int(compression_level) if compression_level else 5
+    restored = restore_dedup_archive(dedup_path, output_dir, compression_level, SCRATCH_DIR)
+    logging.info(f"Archivos reconstruidos: {len(restored)}")
+
+def handle_original_files(file, action, backup_dir):
+    if action == '1':
+        os.remove(file)
+    elif action == '2':
+        os.makedirs(backup_dir, exist_ok=True)
+        shutil.move(file, backup_dir)
+    elif action == '3':
+        pass
+    else:
+        shutil.move(file, backup_dir)
+
+def main():
+    # Verificar e instalar dependencias
+    check_and_install_dependencies()
+    import py7zr
+    import rarfile
+
+    # Verificar disponibilidad de RAR
+    rar_available = check_rar_availability()
+
+    # 1. Pedir el directorio a analizar
+    directory = input("Introduce el directorio a analizar: ")
+
+    # 2. Analizar el directorio y mostrar la cantidad de archivos comprimidos y sus formatos
+    # (sin las salidas de ejecuciones anteriores, que están en el diario)
+    journal = BatchJournal(directory)
+    compressed_files = get_compressed_files(directory, journal)
+    file_formats = {'.' + format: 0 for format in ARCHIVE_FORMATS}
+
+    for file in compressed_files:
+        file_formats['.' + archive_format(file)] += 1
+
+    logging.info(f"Archivos encontrados: {len(compressed_files)}")
+    for format, count in file_formats.items():
+        logging.info(f"{format}: {count}")
+
+    mode = input("¿Qué quieres hacer? (1: Recomprimir, 2: Benchmark de formatos y niveles, 3: Estimar el ahorro, "
+                 "4: Deduplicar en un 7z sólido, 5: Reconstruir desde un 7z deduplicado. Por defecto: 1): ")
+    if mode == '2':
+        run_benchmark_mode(compressed_files)
+        return
+    if mode == '3':
+        run_estimate_mode(compressed_files)
+        return
+    if mode == '4':
+        run_dedup_mode(compressed_files, directory)
+        return
+    if mode == '5':
+        run_restore_mode()
+        return
+
+    # 3. Pedir el formato de recompresión deseado
+    print("Selecciona el formato de recompresión deseado:")
+    print("1: .zip")
+    print("2: .7z")
+    print("3: .tar.gz")
+    print("4: .rar")
+    print("5: .tar.xz")
+    print("6: .tar.zst" + ("" if ZSTD_AVAILABLE else " (no disponible: instala 'zstandard')"))
+    format_option = input("Introduce el número correspondiente al formato (1/2/3/4/5/6): ")
+    format_map = {'1': 'zip', '2': '7z', '3': 'tar.gz', '4': 'rar', '5': 'tar.xz', '6': 'tar.zst'}
+    recompression_format = format_map.get(format_option, 'zip')
+
+    if recompression_format == 'tar.zst' and not ZSTD_AVAILABLE:
+        logging.warning("zstandard no está instalado. Instálalo con: pip install zstandard")
+        return
+
+    if recompression_format == 'rar' and not rar_available:
+        logging.warning("RAR no está disponible. Por favor, elige otro formato.")
+        return
+
+    # 4. Pedir el nivel de compresión
+    compression_level = input("Introduce el nivel de compresión (0-10, por defecto 5): ")
+    compression_level = int(compression_level) if compression_level else 5
+
+    # 5. Mostrar lo que va a hacer y pedir confirmación
+    logging.info(f"Recomprimir {len(compressed_files)} archivos a formato {recompression_format} con nivel de compresión {compression_level}")
+    confirm = input("¿Deseas continuar? (s/n): ")
+    if confirm.lower() != 's':
+        logging.info("Operación cancelada.")
+        return
+
+    # 6. Preguntar qué hacer con los archivos originales
+    original_action = input("¿Qué quieres hacer con los archivos originales después de procesarlos? (1: Eliminarlos, 2: Moverlos a un directorio 'backup', 3: Mantenerlos en su sitio. Por defecto: 2): ")
+    original_action = original_action if original_action in ['1', '2', '3'] else '2'
+    backup_dir = os.path.join(directory, BACKUP_DIRNAME)
+
+    # 7. Descomprimir y recomprimir los archivos (varios a la vez)
+    workers = input(f"Número de archivos a procesar en paralelo (por defecto {DEFAULT_WORKERS}): ")
+    workers = int(workers) if workers.isdigit() and int(workers) > 0 else DEFAULT_WORKERS
+    memory_mb = input(f"Tamaño máximo en MB para recomprimir un archivo en memoria, sin temporal "
+                      f"(por defecto {MEMORY_STAGING_BYTES // (1024 * 1024)}): ")
+    if memory_mb.isdigit():
+        set_memory_staging_limit(int(memory_mb) * 1024 * 1024)
+    scratch_dir = input(f"Directorio temporal para archivos de más de {MEMORY_STAGING_BYTES // (1024 * 1024)} MB "
+                        f"(mejor un tmpfs o SSD rápido; por defecto {SCRATCH_DIR or 'el directorio analizado'}): ")
+    scratch_dir = scratch_dir or SCRATCH_DIR or directory
+    temp_root = tempfile.mkdtemp(prefix=TEMP_PREFIX, dir=scratch_dir)
+
+    # Reanudación: lo que el diario da por terminado no se vuelve a procesar
+    already_done = [file for file in compressed_files if journal.is_done(file)]
+    if already_done:
+        logging.info(f"Se omiten {len(already_done)} archivos ya terminados en una ejecución anterior.")
+        done_set = set(already_done)
+        compressed_files = [file for file in compressed_files if file not in done_set]
+    total_files = len(compressed_files)
+    processed_files, errors = run_batch(compressed_files, recompression_format, compression_level,
+                                        original_action, backup_dir, temp_root, workers, journal)
+
+    # 8. Mostrar información final del proceso
+    logging.info("Proceso completado.")
+    logging.info(f"Archivos procesados: {processed_files}")
+    if processed_files != total_files:
+        logging.warning(f"Errores encontrados: {total_files - processed_files}")
+        for file, error in errors:
+            logging.warning(f"  {file}: {error}")
+    COMPRESSION_REPORT.log()
+
+    remove_scratch(temp_root)
+
+if __name__ == "__main__":
+    main()
@@ -9,52 +9,144 @@
 
 import os
 import sys
+import argparse
 import shutil
-import subprocess
-import platform
 from datetime import datetime
 import logging
-from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
 import locale
 import re
+import sqlite3
+import struct
+import threading
+import queue
+import json
+import time
+# concurrent.futures, subprocess, platform, hashlib, csv y select se importan dentro
+# de las funciones que los usan para que el arranque sea inmediato.
 
 # --- Configuración Inicial y Dependencias ---
+# Nada pesado se ejecuta al importar el módulo: los procesos trabajadores lo vuelven a
+# importar al arrancar (spawn) y --version/--dry-run deben responder al instante.
+# Pillow, piexif y colorama se cargan solo en el código que los necesita.
 
-# Importante para tener los nombres de los meses en el idioma local (ej: español)
-try:
-    # Para Linux/macOS
-    locale.setlocale(locale.LC_TIME, 'es_ES.UTF-8') 
-except locale.Error:
+_locale_ready = False
+
+def setup_locale():
+    """Nombres de los meses en el idioma local (ej: español). Se aplica una vez por proceso."""
+    global _locale_ready
+    if _locale_ready:
+        return
+    _locale_ready = True
     try:
-        # Para Windows
-        locale.setlocale(locale.LC_TIME, 'Spanish_Spain.1252')
+        # Para Linux/macOS
+        locale.setlocale(locale.LC_TIME, 'es_ES.UTF-8') 
     except locale.Error:
-        # Fallback si los locales específicos no están disponibles
-        locale.setlocale(locale.LC_TIME, '') 
-
-try:
-    from colorama import Fore, Style, init
-except ImportError:
-    print("Advertencia: 'colorama' no está instalado. Se procederá a instalarlo en un entorno virtual.")
-    class EmptyColor:
-        def __getattr__(self, name): return ""
-    Fore = EmptyColor()
-    Style = EmptyColor()
-    def init(autoreset=True): pass
-
-init(autoreset=True)
-
-try:
-    from PIL import Image
-    import piexif
-except ImportError:
-    print("Advertencia: 'Pillow' o 'piexif' no están instalados. Se instalarán en el entorno virtual.")
+        try:
+            # Para Windows
+            locale.setlocale(locale.LC_TIME, 'Spanish_Spain.1252')
+        except locale.Error:
+            # Fallback si los locales específicos no están disponibles
+            locale.setlocale(locale.LC_TIME, '') 
+
+_colorama_ready = False
+
+class _LazyColor:
+    """Sustituto de colorama.Fore/Style que importa colorama en el primer uso (o devuelve "")."""
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, attr):
+        global _colorama_ready
+        try:
+            import colorama
+            if not _colorama_ready:
+                colorama.init(autoreset=True)  # Una sola vez: cada init vuelve a envolver stdout
+                _colorama_ready = True
+            value = getattr(getattr(colorama, self._name), attr)
+        except (ImportError, AttributeError):
+            value = ""
+        setattr(self, attr, value)  # Las siguientes consultas no pasan por aquí
+        return value
+
+Fore = _LazyColor('Fore')
+Style = _LazyColor('Style')
+
+_exif_modules = None
+
+def load_exif_modules():
+    """Importa Pillow y piexif la primera vez que se necesitan. Devuelve (Image, piexif) o (None, None)."""
+    global _exif_modules
+    if _exif_modules is None:
+        try:
+            from PIL import Image
+            import piexif
+            _exif_modules = (Image, piexif)
+        except ImportError:
+            _exif_modules = (None, None)
+    return _exif_modules
 
 VERSION = "1.1"
 SCRIPT_NAME = "Organizador Fotográfico"
 
+# Versión de la lógica de obtención de fechas. Cualquier cambio en cómo se
+# resuelve la fecha de un archivo debe incrementarla: invalida la caché.
+DATE_LOGIC_VERSION = 3
+CACHE_FILENAME = ".organizador_cache.sqlite3"
+CACHE_FLUSH_EVERY = 500
+
+# Detección de duplicados: bytes leídos del principio y del final para el hash rápido
+DEDUP_SAMPLE_SIZE = 64 * 1024
+DUPLICATE_ACTIONS = {'1': 'omitir', '2': 'enlazar'}
+
+# Modos de transferencia al destino
+TRANSFER_MODES = {'1': 'copiar', '2': 'mover', '3': 'enlazar'}
+
+# Estimación previa (--estimar): sondeo corto de lectura/escritura y margen de espacio libre
+PROBE_READ_BYTES = 64 * 1024 * 1024
+PROBE_WRITE_BYTES = 32 * 1024 * 1024
+PROBE_MAX_SECONDS = 3.0
+PROBE_METADATA_OPS = 200
+SPACE_SAFETY_MARGIN = 0.05  # Se exige dejar libre al menos este porcentaje del disco
+
+# Vídeos ISO-BMFF (MP4/QuickTime): la fecha se lee de moov/mvhd
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.m4v', '.3gp', '.3g2')
+QUICKTIME_EPOCH_OFFSET = 2082844800  # Segundos entre 1904-01-01 y 1970-01-01
+
+# Canalización escaneo -> organización
+SCAN_QUEUE_SIZE = 1000      # Rutas pendientes como máximo entre el escáner y los trabajadores
+TASKS_PER_WORKER = 4        # Tareas enviadas por trabajador y todavía sin terminar
+
+# Ejecutor por hilos: el trabajo es sobre todo E/S (cabeceras pequeñas y copias), así que
+# se limita la concurrencia por dispositivo en lugar de repartir procesos por CPU.
+EXECUTOR_MODES = ('auto', 'hilos', 'procesos')
+DEFAULT_IO_THREADS = 8
+SOURCE_IO_LIMIT = 4         # Lecturas simultáneas por dispositivo origen
+DEST_IO_LIMIT = 2           # Escrituras simultáneas por dispositivo destino
+
+# Ráfagas y casi duplicados (etapa opcional, hash perceptual dHash de 64 bits)
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.bmp', '.tif', '.tiff')
+BURSTS_DIRNAME = '_bursts'
+BURST_MAX_DISTANCE = 6      # Bits distintos (de 64) para considerar dos fotos casi iguales
+DHASH_SIZE = 8
+
+# Modo demonio (Linux, inotify): organiza continuamente una carpeta de entrada
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+DAEMON_EVENT_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+DAEMON_DEBOUNCE_SECONDS = 5     # Silencio necesario antes de dar un archivo por terminado
+DAEMON_BATCH_SIZE = 500         # Archivos como máximo por lote de organización
+DAEMON_RETRY_SECONDS = 300      # Espera antes de reintentar un archivo que falló
+DAEMON_STATE_FILENAME = ".organizador_demonio.json"
+
 def setup_virtualenv_and_install():
     """Crea un entorno virtual e instala las dependencias necesarias."""
+    import subprocess
+    import platform
     if not os.path.exists("venv"):
         print(Fore.CYAN + "Creando entorno virtual 'venv'..." + Style.RESET_ALL)
         subprocess.check_call([sys.executable, "-m", "venv", "venv"])
@@ -68,11 +160,9 @@ def setup_virtualenv_and_install():
 
 def ensure_dependencies():
     """Asegura que las dependencias estén disponibles y reinicia el script en el venv si es necesario."""
-    try:
-        import PIL
-        import piexif
-        import colorama
-    except ImportError:
+    # find_spec comprueba que existen sin llegar a importarlos
+    from importlib.util import find_spec
+    if any(find_spec(name) is None for name in ('PIL', 'piexif', 'colorama')):
         python_exec = setup_virtualenv_and_install()
         print(Fore.GREEN + "Dependencias instaladas. Reiniciando el script dentro del entorno virtual..." + Style.RESET_ALL)
         os.execv(python_exec, [python_exec] + sys.argv)
@@ -102,149 +192,1296 @@ def print_banner():
 
 # --- Lógica de Procesamiento ---
 
+# Reglas para extraer fechas de nombres de archivo, compiladas una sola vez y
+# evaluadas en orden: de la convención más específica a la más genérica.
+# Los grupos con nombre (year, month, day, hour, minute, second, epoch_ms)
+# los interpreta _date_from_match().
+_D8 = r'(?P<year>\d{4})(?P<month>\d{2})(?P<day>\d{2})'
+_T6 = r'(?P<hour>\d{2})(?P<minute>\d{2})(?P<second>\d{2})'
+FILENAME_DATE_RULES = [
+    # Android / Pixel / cámaras: IMG_20230811_123456, VID_20230811_123456, PXL_20230811_123456789
+    ('camara', re.compile(r'^(?:IMG|VID|PXL|MVIMG|PANO|BURST)_' + _D8 + '_' + _T6, re.IGNORECASE)),
+    # WhatsApp: IMG-20230811-WA0001, VID-20230811-WA0002
+    ('whatsapp', re.compile(r'^(?:IMG|VID|AUD|PTT|STK)-' + _D8 + r'-WA\d+', re.IGNORECASE)),
+    # Capturas: Screenshot_20230811-123456, Screenshot_2023-08-11-12-34-56, Screenshot 2023-08-11 at 12.34.56
+    ('captura', re.compile(r'^Screenshot[_ -]?(?P<year>\d{4})-?(?P<month>\d{2})-?(?P<day>\d{2})'
+                           r'(?:(?:[_ -]|\s+at\s+)(?P<hour>\d{2})[-_.]?(?P<minute>\d{2})[-_.]?(?P<second>\d{2}))?',
+                           re.IGNORECASE)),
+    # Drones DJI: DJI_20230811123456_0001_D
+    ('dji', re.compile(r'^DJI_' + _D8 + _T6, re.IGNORECASE)),
+    # Marca de tiempo Unix en milisegundos: 1691757296000, FB_IMG_1691757296000
+    ('epoch_ms', re.compile(r'(?<!\d)(?P<epoch_ms>1\d{12})(?!\d)')),
+    # Genéricos: DSC_20230811_123456, 2023-08-11, 20230811
+    ('fecha_hora', re.compile(r'(?<!\d)' + _D8 + r'[_-]' + _T6 + r'(?!\d)')),
+    ('fecha_separada', re.compile(r'(?<!\d)(?P<year>\d{4})[-_.](?P<month>\d{2})[-_.](?P<day>\d{2})(?!\d)')),
+    ('fecha', re.compile(r'(?<!\d)' + _D8 + r'(?!\d)')),
+]
+FILENAME_MIN_YEAR = 1990
+
+def _date_from_match(match):
+    """Convierte una coincidencia de FILENAME_DATE_RULES en datetime, o None si no es una fecha real."""
+    groups = match.groupdict()
+    try:
+        if groups.get('epoch_ms'):
+            date = datetime.fromtimestamp(int(groups['epoch_ms']) / 1000)
+        else:
+            date = datetime(int(groups['year']), int(groups['month']), int(groups['day']),
+                            int(groups.get('hour') or 0), int(groups.get('minute') or 0),
+                            int(groups.get('second') or 0))
+    except (ValueError, OverflowError, OSError):
+        return None  # Mes 13, 30 de febrero, hora 25...
+    # Descartar fechas anteriores a la fotografía digital o en el futuro
+    if not FILENAME_MIN_YEAR <= date.year <= datetime.now().year + 1:
+        return None
+    return date
+
 def get_date_from_filename(filename):
     """
     Intenta obtener la fecha de creación desde el nombre del archivo.
-    Busca patrones como: IMG-20230811-WA0001.jpg, DSC_20230811_123456.jpg
+    Busca patrones como: IMG_20230811_123456.jpg, IMG-20230811-WA0001.jpg,
+    PXL_20230811_123456789.jpg, Screenshot_20230811-123456.png, DSC_20230811_123456.jpg
     """
     basename = os.path.splitext(filename)[0]
-    
-    # Patrones para encontrar fechas YYYYMMDD o YYMMDD en nombres de archivo
-    patterns = [
-        # Busca YYYYMMDD (4 dígitos año + 2 mes + 2 día)
-        r'(?:[A-Za-z0-9_-]*)(\d{4})(\d{2})(\d{2})(?:[A-Za-z0-9_-]*)',
-        
-        # También busca YYMMDD (2 dígitos año + 2 mes + 2 día)  
-        r'(?:[A-Za-z0-9_-]*)(\d{2})(\d{2})(\d{2})(?:[A-Za-z0-9_-]*)',
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, basename)
+    for _, rule in FILENAME_DATE_RULES:
+        match = rule.search(basename)
         if match:
-            try:
-                groups = match.groups()
-                if len(groups) == 3:
-                    # Verificar si es YYYYMMDD o YYMMDD
-                    if len(groups[0]) == 4:  # YYYYMMDD
-                        year, month, day = map(int, groups)
-                    else:  # YYMMDD (2 dígitos para año)
-                        year = int(groups[0]) + 2000  # Suponemos 2000-2099
-                        month, day = map(int, groups[1:])
-                    
-                    # Validar que la fecha sea razonable
-                    if 1 <= month <= 12 and 1 <= day <= 31:
-                        return datetime(year, month, day)
-            except ValueError:
+            date = _date_from_match(match)
+            if date:
+                return date
+    return None
+
+def _sample_filenames(count):
+    """Genera nombres de archivo representativos (con su fecha esperada o None) para el benchmark."""
+    import random
+    rnd = random.Random(1234)
+    samples = []
+    for i in range(count):
+        d = datetime(rnd.randint(2005, 2024), rnd.randint(1, 12), rnd.randint(1, 28),
+                     rnd.randint(0, 23), rnd.randint(0, 59), rnd.randint(0, 59))
+        kind = i % 10
+        if kind == 0: name, exp = d.strftime('IMG_%Y%m%d_%H%M%S.jpg'), d
+        elif kind == 1: name, exp = d.strftime('PXL_%Y%m%d_%H%M%S') + f'{rnd.randint(0, 999):03d}.MP.jpg', d
+        elif kind == 2: name, exp = d.strftime('IMG-%Y%m%d-WA') + f'{rnd.randint(0, 9999):04d}.jpeg', d.replace(hour=0, minute=0, second=0)
+        elif kind == 3: name, exp = d.strftime('Screenshot_%Y%m%d-%H%M%S_Chrome.png'), d
+        elif kind == 4: name, exp = d.strftime('DJI_%Y%m%d%H%M%S_0001_D.JPG'), d
+        elif kind == 5: name, exp = d.strftime('VID_%Y%m%d_%H%M%S.mp4'), d
+        elif kind == 6: name, exp = f'{int(d.timestamp() * 1000)}.jpg', d
+        elif kind == 7: name, exp = d.strftime('DSC_%Y%m%d_%H%M%S.JPG'), d
+        elif kind == 8: name, exp = f'DSC_{rnd.randint(0, 9999):04d}.JPG', None
+        else: name, exp = f'{rnd.randint(100000, 999999)}_{rnd.getrandbits(32):08x}.jpg', None
+        samples.append((name, exp))
+    return samples
+
+def benchmark_filename_dates(count=20000, rounds=5):
+    """Micro-benchmark de get_date_from_filename sobre nombres sintéticos con fecha conocida."""
+    import time
+    samples = _sample_filenames(count)
+    names = [name for name, _ in samples]
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for name in names:
+            get_date_from_filename(name)
+        best = min(best, time.perf_counter() - start)
+    wrong = [(name, exp, got) for name, exp in samples
+             for got in [get_date_from_filename(name)] if got != exp]
+    print(f"Nombres analizados:   {count} (mejor de {rounds} rondas)")
+    print(f"Tiempo por nombre:    {best / count * 1e6:.2f} µs")
+    print(f"Resultados erróneos:  {len(wrong)}")
+    for name, exp, got in wrong[:10]:
+        print(f"  {name}: esperado {exp}, obtenido {got}")
+    return not wrong
+
+def _iter_boxes(f, start, end):
+    """
+    Recorre las cajas (atoms) ISO-BMFF entre `start` y `end` leyendo solo sus cabeceras.
+    Devuelve (tipo, inicio_del_contenido, fin_de_la_caja) sin leer nunca los datos multimedia.
+    """
+    pos = start
+    while pos + 8 <= end:
+        f.seek(pos)
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        size, box_type = struct.unpack('>I4s', header)
+        header_size = 8
+        if size == 1:  # Tamaño de 64 bits (mdat de varios GB)
+            ext = f.read(8)
+            if len(ext) < 8:
+                return
+            size = struct.unpack('>Q', ext)[0]
+            header_size = 16
+        elif size == 0:  # La caja llega hasta el final del archivo
+            size = end - pos
+        if size < header_size:
+            return  # Archivo corrupto o no es ISO-BMFF
+        yield box_type, pos + header_size, pos + size
+        pos += size
+
+def get_date_from_video(file_path):
+    """
+    Obtiene la fecha de grabación (creation_time de moov/mvhd) de un MP4/MOV.
+    Salta directamente de cabecera en cabecera, así que funciona igual si 'moov'
+    está al final del archivo y solo necesita unas pocas lecturas pequeñas.
+    """
+    with open(file_path, 'rb') as f:
+        end = f.seek(0, os.SEEK_END)
+        for box_type, body, box_end in _iter_boxes(f, 0, end):
+            if box_type != b'moov':
                 continue
-    
+            for child_type, child_body, _ in _iter_boxes(f, body, box_end):
+                if child_type != b'mvhd':
+                    continue
+                f.seek(child_body)
+                data = f.read(12)
+                if len(data) < 8:
+                    return None
+                if data[0] == 1 and len(data) == 12:  # Versión 1: campos de 64 bits
+                    creation = struct.unpack('>Q', data[4:12])[0]
+                else:
+                    creation = struct.unpack('>I', data[4:8])[0]
+                if creation <= QUICKTIME_EPOCH_OFFSET:
+                    return None  # Sin fecha (0) o anterior a 1970: no es fiable
+                # creation_time está en UTC; se convierte a hora local
+                date = datetime.fromtimestamp(creation - QUICKTIME_EPOCH_OFFSET)
+                if not FILENAME_MIN_YEAR <= date.year <= datetime.now().year + 1:
+                    return None
+                return date
+            return None
     return None
 
-def organize_single_file(args):
+class DateCache:
     """
-    Procesa un único archivo para obtener su fecha y copiarlo a la carpeta destino.
+    Caché persistente (SQLite) de fechas ya resueltas.
+    Clave: (ruta, tamaño, mtime) -> Valor: (fecha, origen de la fecha).
+    Si cambia DATE_LOGIC_VERSION se descarta todo su contenido.
     """
-    file_path, base_dest_dir = args
-    result = {'src': file_path, 'dest': None, 'ok': False, 'error': None, 'date_source': None}
-    
-    file_date = None
-    
-    # 1. INTENTO 1: OBTENER FECHA DE METADATOS EXIF
+    def __init__(self, db_path, readonly=False):
+        self.db_path = db_path
+        if readonly:
+            uri = 'file:' + os.path.abspath(db_path) + '?mode=ro'
+            self.conn = sqlite3.connect(uri, uri=True, timeout=30)
+        else:
+            self.conn = sqlite3.connect(db_path, timeout=30)
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self._ensure_schema()
+
+    def _ensure_schema(self):
+        with self.conn:
+            self.conn.execute('CREATE TABLE IF NOT EXISTS meta (clave TEXT PRIMARY KEY, valor TEXT)')
+            row = self.conn.execute("SELECT valor FROM meta WHERE clave = 'date_logic_version'").fetchone()
+            if row is None or row[0] != str(DATE_LOGIC_VERSION):
+                # La lógica de fechas ha cambiado: nada de lo guardado es fiable
+                self.conn.execute('DROP TABLE IF EXISTS fechas')
+                self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('date_logic_version', ?)",
+                                  (str(DATE_LOGIC_VERSION),))
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS fechas (
+                    ruta TEXT PRIMARY KEY,
+                    tamano INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    fecha TEXT NOT NULL,
+                    origen TEXT NOT NULL
+                )""")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS huellas (
+                    ruta TEXT PRIMARY KEY,
+                    tamano INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    dhash TEXT NOT NULL
+                )""")
+
+    def get(self, path, size, mtime_ns):
+        """Devuelve (fecha, origen) si la entrada existe y el archivo no ha cambiado."""
+        row = self.conn.execute(
+            'SELECT fecha, origen FROM fechas WHERE ruta = ? AND tamano = ? AND mtime_ns = ?',
+            (path, size, mtime_ns)).fetchone()
+        if row is None:
+            return None
+        return datetime.fromisoformat(row[0]), row[1]
+
+    def put_many(self, entries):
+        """Guarda una lista de tuplas (ruta, tamaño, mtime_ns, fecha_iso, origen)."""
+        if not entries:
+            return
+        with self.conn:
+            self.conn.executemany('INSERT OR REPLACE INTO fechas VALUES (?, ?, ?, ?, ?)', entries)
+
+    def get_hash(self, path, size, mtime_ns):
+        """Devuelve el hash perceptual guardado de una imagen que no ha cambiado, o None."""
+        row = self.conn.execute(
+            'SELECT dhash FROM huellas WHERE ruta = ? AND tamano = ? AND mtime_ns = ?',
+            (path, size, mtime_ns)).fetchone()
+        return int(row[0], 16) if row else None
+
+    def put_hashes(self, entries):
+        """Guarda una lista de tuplas (ruta, tamaño, mtime_ns, hash)."""
+        with self.conn:
+            self.conn.executemany('INSERT OR REPLACE INTO huellas VALUES (?, ?, ?, ?)',
+                                  [(p, size, mtime, f"{h:016x}") for p, size, mtime, h in entries])
+
+    def close(self):
+        self.conn.close()
+
+# Conexiones de solo lectura abiertas por cada hilo/proceso trabajador
+# (sqlite3 no permite compartir una conexión entre hilos)
+_worker_local = threading.local()
+
+def lookup_cached_date(cache_path, file_path, size, mtime_ns):
+    """Consulta la caché de fechas desde un trabajador (abre la conexión una vez por hilo)."""
+    if not cache_path:
+        return None
     try:
-        img = Image.open(file_path)
-        exif_dict = piexif.load(img.info['exif'])
-        date_str = exif_dict['Exif'][36867].decode('utf-8') # 36867 = DateTimeOriginal
-        file_date = datetime.strptime(date_str, '%Y:%m:%d %H:%M:%S')
-        result['date_source'] = 'EXIF'
-    except (AttributeError, KeyError, ValueError, IOError, SyntaxError):
-        # Fallos comunes: no es imagen, no tiene EXIF, etiqueta no existe, etc.
-        pass
+        caches = _worker_local.__dict__.setdefault('caches', {})
+        cache = caches.get(cache_path)
+        if cache is None:
+            cache = caches[cache_path] = DateCache(cache_path, readonly=True)
+        return cache.get(file_path, size, mtime_ns)
+    except (sqlite3.Error, ValueError):
+        return None
 
-    # 2. INTENTO 2: OBTENER FECHA DEL NOMBRE DEL ARCHIVO
-    if not file_date:
+def resolve_file_date(file_path):
+    """
+    Obtiene la fecha de un archivo probando, por orden: EXIF, metadatos de vídeo,
+    nombre y fecha de modificación.
+    Devuelve (fecha, origen). Lanza OSError si ni siquiera se puede leer la fecha del archivo.
+    """
+    # 1. INTENTO 1: OBTENER FECHA DE METADATOS EXIF (los vídeos no tienen, no se carga Pillow)
+    Image, piexif = (None, None) if file_path.lower().endswith(VIDEO_EXTENSIONS) else load_exif_modules()
+    if Image is not None:
         try:
-            filename_date = get_date_from_filename(os.path.basename(file_path))
-            if filename_date:
-                file_date = filename_date
-                result['date_source'] = 'Nombre'
-        except Exception as e:
-            pass  # Si falla, seguimos con el siguiente intento
+            with Image.open(file_path) as img:
+                exif_dict = piexif.load(img.info['exif'])
+            date_str = exif_dict['Exif'][36867].decode('utf-8') # 36867 = DateTimeOriginal
+            return datetime.strptime(date_str, '%Y:%m:%d %H:%M:%S'), 'EXIF'
+        except (AttributeError, KeyError, ValueError, IOError, SyntaxError):
+            # Fallos comunes: no es imagen, no tiene EXIF, etiqueta no existe, etc.
+            pass
+
+    # 1b. VÍDEOS: FECHA DE GRABACIÓN DEL ATOM mvhd
+    if file_path.lower().endswith(VIDEO_EXTENSIONS):
+        try:
+            video_date = get_date_from_video(file_path)
+            if video_date:
+                return video_date, 'Video'
+        except (OSError, struct.error, OverflowError, ValueError):
+            pass
+
+    # 2. INTENTO 2: OBTENER FECHA DEL NOMBRE DEL ARCHIVO
+    try:
+        filename_date = get_date_from_filename(os.path.basename(file_path))
+        if filename_date:
+            return filename_date, 'Nombre'
+    except Exception:
+        pass  # Si falla, seguimos con el siguiente intento
 
     # 3. INTENTO 3: OBTENER FECHA DE MODIFICACIÓN DEL ARCHIVO (FALLBACK)
-    if not file_date:
+    mod_time = os.path.getmtime(file_path)
+    return datetime.fromtimestamp(mod_time), 'Archivo'
+
+def _quick_hash(path, size):
+    """Hash del tamaño más los primeros y últimos DEDUP_SAMPLE_SIZE bytes del archivo."""
+    import hashlib
+    h = hashlib.sha1(str(size).encode())
+    with open(path, 'rb') as f:
+        h.update(f.read(DEDUP_SAMPLE_SIZE))
+        if size > 2 * DEDUP_SAMPLE_SIZE:
+            f.seek(-DEDUP_SAMPLE_SIZE, os.SEEK_END)
+            h.update(f.read(DEDUP_SAMPLE_SIZE))
+    return h.digest()
+
+def _full_hash(path):
+    import hashlib
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(chunk)
+    return h.digest()
+
+class DuplicateIndex:
+    """
+    Índice de contenido de las carpetas destino para detectar duplicados exactos.
+    Agrupa los archivos por tamaño; solo si coincide el tamaño compara un hash rápido
+    (principio y final del archivo) y solo si este coincide, el hash completo.
+    Cada carpeta se indexa la primera vez que se usa. Lo que escribe este proceso se añade al
+    índice sin volver a leer la carpeta (y se guarda el mtime resultante); solo si el mtime cambia
+    por otro motivo (otro proceso ha copiado o borrado archivos) se vuelve a leer entera. Los
+    candidatos que han desaparecido se quitan del índice al comprobarlos. Los hashes se guardan
+    junto con el tamaño y el mtime del archivo y solo valen mientras estos no cambien.
+    """
+    def __init__(self):
+        self.folders = {}   # carpeta -> {'mtime_ns', 'sizes': {nombre: tamaño}, 'by_size'}
+        self.hashes = {}    # (ruta, tipo) -> (tamaño, mtime_ns, hash)
+        self._lock = threading.Lock()  # Compartido entre hilos en el ejecutor por hilos
+
+    def _hash(self, path, st, kind):
+        key = (path, kind)
+        cached = self.hashes.get(key)
+        if cached is None or cached[:2] != (st.st_size, st.st_mtime_ns):
+            digest = _quick_hash(path, st.st_size) if kind == 'rapido' else _full_hash(path)
+            cached = self.hashes[key] = (st.st_size, st.st_mtime_ns, digest)
+        return cached[2]
+
+    def _refresh(self, folder):
+        entry = self.folders.get(folder)
+        mtime_ns = os.stat(folder).st_mtime_ns
+        if entry and entry['mtime_ns'] == mtime_ns:
+            return entry
+        entry = {'mtime_ns': mtime_ns, 'sizes': {}, 'by_size': {}}
+        with os.scandir(folder) as it:
+            for item in it:
+                if item.is_file(follow_symlinks=False):
+                    self._set(entry, item.path, item.stat().st_size)
+        self.folders[folder] = entry
+        return entry
+
+    @staticmethod
+    def _set(entry, path, size):
+        name = os.path.basename(path)
+        old = entry['sizes'].get(name)
+        if old == size:
+            return
+        if old is not None:
+            entry['by_size'][old].remove(path)
+        entry['sizes'][name] = size
+        entry['by_size'].setdefault(size, []).append(path)
+
+    def _forget(self, path):
+        entry = self.folders.get(os.path.dirname(path))
+        size = entry['sizes'].pop(os.path.basename(path), None) if entry else None
+        if size is not None:
+            entry['by_size'][size].remove(path)
+
+    def find_duplicate(self, src_path, size, folder):
+        """Devuelve la ruta de un archivo de `folder` con el mismo contenido que `src_path`, o None."""
+        with self._lock:
+            candidates = list(self._refresh(folder)['by_size'].get(size, ()))
+        if not candidates:
+            return None
+        src_st = os.stat(src_path)
+        src_quick = self._hash(src_path, src_st, 'rapido')
+        for candidate in candidates:
+            try:
+                st = os.stat(candidate)
+            except OSError:
+                with self._lock:
+                    self._forget(candidate)  # Borrado desde la última lectura de la carpeta
+                continue
+            try:
+                if st.st_size != size or self._hash(candidate, st, 'rapido') != src_quick:
+                    continue
+                if self._hash(candidate, st, 'completo') != self._hash(src_path, src_st, 'completo'):
+                    continue
+                # Sigue ahí y sin cambios después de compararlo
+                after = os.stat(candidate)
+                if (after.st_size, after.st_mtime_ns) == (st.st_size, st.st_mtime_ns):
+                    return candidate
+            except OSError:
+                continue  # El candidato ha desaparecido o no se puede leer
+        return None
+
+    def add(self, path, size):
+        """Anota un archivo que acaba de escribir este proceso, sin volver a leer la carpeta."""
+        folder = os.path.dirname(path)
+        with self._lock:
+            entry = self.folders.get(folder)
+            if entry is None:
+                self._refresh(folder)
+                return
+            self._set(entry, path, size)
+            entry['mtime_ns'] = os.stat(folder).st_mtime_ns
+
+# Índice de duplicados de cada proceso trabajador
+_dedup_index = DuplicateIndex()
+
+class DeviceLimiter:
+    """Limita cuántas operaciones de E/S se ejecutan a la vez sobre cada dispositivo (st_dev)."""
+    def __init__(self, source_limit, dest_limit):
+        self.limits = {'origen': source_limit, 'destino': dest_limit}
+        self._semaphores = {}
+        self._lock = threading.Lock()
+
+    def _semaphore(self, role, device):
+        with self._lock:
+            key = (role, device)
+            if key not in self._semaphores:
+                self._semaphores[key] = threading.BoundedSemaphore(self.limits[role])
+            return self._semaphores[key]
+
+    @contextmanager
+    def hold(self, source_dev=None, dest_dev=None):
+        # Orden fijo de adquisición (origen y luego destino) para evitar interbloqueos
+        acquired = []
         try:
-            mod_time = os.path.getmtime(file_path)
-            file_date = datetime.fromtimestamp(mod_time)
-            result['date_source'] = 'Archivo'
+            for role, device in (('origen', source_dev), ('destino', dest_dev)):
+                if device is not None:
+                    sem = self._semaphore(role, device)
+                    sem.acquire()
+                    acquired.append(sem)
+            yield
+        finally:
+            for sem in reversed(acquired):
+                sem.release()
+
+# Limitador de E/S por dispositivo; solo se activa con el ejecutor por hilos
+_io_limiter = None
+
+@contextmanager
+def io_slot(source_dev=None, dest_dev=None):
+    if _io_limiter is None:
+        yield
+    else:
+        with _io_limiter.hold(source_dev, dest_dev):
+            yield
+
+def free_dest_path(dest_path):
+    """Nombre que recibiría el archivo en el destino, sin reservarlo (para simulaciones)."""
+    root, ext = os.path.splitext(dest_path)
+    candidate, suffix = dest_path, 0
+    while os.path.exists(candidate):
+        suffix += 1
+        candidate = f"{root}_{suffix:03d}{ext}"
+    return candidate
+
+def reserve_dest_path(dest_path):
+    """
+    Reserva de forma atómica un nombre libre en el destino: el original o, si ya existe,
+    uno con sufijo (foto_001.jpg, foto_002.jpg...). Devuelve la ruta reservada.
+    """
+    root, ext = os.path.splitext(dest_path)
+    candidate, suffix = dest_path, 0
+    while True:
+        try:
+            os.close(os.open(candidate, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return candidate
+        except FileExistsError:
+            suffix += 1
+            candidate = f"{root}_{suffix:03d}{ext}"
+
+def organize_single_file(args):
+    """
+    Procesa un único archivo para obtener su fecha y copiarlo a la carpeta destino.
+    """
+    file_path, base_dest_dir, options = args
+    dry_run = options.get('dry_run', False)
+    result = {'src': file_path, 'dest': None, 'ok': False, 'error': None, 'date_source': None,
+              'date': None, 'size': None, 'mtime_ns': None, 'cached': False, 'duplicate_of': None,
+              'simulated': dry_run}
+    setup_locale()  # Los nombres de los meses dependen del locale de este proceso
+
+    # 0. CONSULTAR LA CACHÉ DE FECHAS (solo si el archivo no ha cambiado)
+    try:
+        st = os.stat(file_path)
+    except OSError as e:
+        result['error'] = f"No se pudo obtener la fecha del archivo: {e}"
+        return result
+    result['size'], result['mtime_ns'] = st.st_size, st.st_mtime_ns
+
+    cached = lookup_cached_date(options.get('cache_path'), os.path.abspath(file_path), st.st_size, st.st_mtime_ns)
+    if cached:
+        file_date, result['date_source'] = cached
+        result['cached'] = True
+    else:
+        # 1-3. EXIF, VÍDEO, NOMBRE O FECHA DE MODIFICACIÓN
+        try:
+            with io_slot(st.st_dev):
+                file_date, result['date_source'] = resolve_file_date(file_path)
         except Exception as e:
             result['error'] = f"No se pudo obtener la fecha del archivo: {e}"
             return result
+    result['date'] = file_date.isoformat()
 
     # 4. CONSTRUIR RUTA DE DESTINO
     year = str(file_date.year)
     month_name = file_date.strftime('%m - %B').capitalize() # Ej: "08 - Agosto"
     dest_subdir = os.path.join(base_dest_dir, year, month_name)
     
-    # 5. CREAR DIRECTORIOS
-    os.makedirs(dest_subdir, exist_ok=True)
+    # 5. CREAR DIRECTORIOS (en simulación no se escribe nada en el destino)
+    if not dry_run:
+        os.makedirs(dest_subdir, exist_ok=True)
     
-    # 6. COPIAR ARCHIVO
+    # 6. BUSCAR DUPLICADOS EXACTOS EN LA CARPETA DESTINO
+    dest_path = os.path.join(dest_subdir, os.path.basename(file_path))
     try:
-        dest_path = os.path.join(dest_subdir, os.path.basename(file_path))
-        if os.path.exists(dest_path):
-            result['error'] = "El archivo ya existe en el destino"
+        with io_slot(st.st_dev, options.get('dest_dev')):
+            duplicate = (_dedup_index.find_duplicate(file_path, st.st_size, dest_subdir)
+                         if os.path.isdir(dest_subdir) else None)
+    except OSError as e:
+        result['error'] = f"Error al buscar duplicados: {e}"
+        return result
+    if duplicate:
+        result['duplicate_of'] = duplicate
+        if dry_run:
             return result
-        
-        shutil.copy2(file_path, dest_path) # copy2 preserva metadatos
-        result['dest'] = dest_path
+        if options.get('duplicates') == 'enlazar' and not os.path.exists(dest_path):
+            try:
+                os.link(duplicate, dest_path)  # Mismo contenido, sin ocupar espacio extra
+                result['dest'] = dest_path
+            except OSError:
+                pass  # Sistema de archivos sin enlaces duros: se omite sin más
+        return result
+
+    # 7. COPIAR, MOVER O ENLAZAR (con sufijo si ya existe otro archivo distinto con ese nombre)
+    if dry_run:
+        result['dest'] = free_dest_path(dest_path)
+        result['ok'] = True
+        return result
+    transfer = options.get('transfer', 'copiar')
+    reserved = None
+    try:
+        reserved = reserve_dest_path(dest_path)
+        with io_slot(st.st_dev, options.get('dest_dev')):
+            if transfer == 'mover':
+                shutil.move(file_path, reserved)  # rename si es el mismo disco; si no, copia y borra
+            elif transfer == 'enlazar':
+                # Enlace duro con nombre temporal y rename atómico sobre el nombre reservado
+                tmp_link = reserved + '.tmp_enlace'
+                os.link(file_path, tmp_link)
+                os.replace(tmp_link, reserved)
+            else:
+                shutil.copy2(file_path, reserved) # copy2 preserva metadatos
+        _dedup_index.add(reserved, st.st_size)
+        result['dest'] = reserved
         result['ok'] = True
     except Exception as e:
-        result['error'] = f"Error al copiar el archivo: {e}"
+        result['error'] = f"Error al {transfer} el archivo: {e}"
+        if reserved:
+            try:
+                os.remove(reserved)  # No dejar archivos a medias en el destino
+            except OSError:
+                pass
         
     return result
 
-def run_organizer(files_list, dest_dir, workers, logger):
+def new_stats():
+    return {'total': 0, 'processed': 0, 'errors': 0, 'exif': 0, 'filename': 0,
+            'video': 0, 'file_date': 0, 'cached': 0, 'duplicates': 0, 'failed': []}
+
+def record_result(res, stats, logger, pending_cache):
+    """Actualiza contadores y registro con el resultado de un archivo."""
+    if res['date'] and not res['cached']:
+        pending_cache.append((os.path.abspath(res['src']), res['size'], res['mtime_ns'],
+                              res['date'], res['date_source']))
+    if res['cached']:
+        stats['cached'] += 1
+    if res['duplicate_of']:
+        stats['duplicates'] += 1
+        action = f"enlazado en {res['dest']}" if res['dest'] else "omitido"
+        logger.info(f"DUPLICADO ({action}): {res['src']} == {res['duplicate_of']}")
+    elif res['ok']:
+        stats['processed'] += 1
+        status = "SIMULADO" if res['simulated'] else "OK"
+        logger.info(f"{status} ({res['date_source']}): {res['src']} -> {res['dest']}")
+        if res['date_source'] == 'EXIF': stats['exif'] += 1
+        elif res['date_source'] == 'Video': stats['video'] += 1
+        elif res['date_source'] == 'Nombre': stats['filename'] += 1
+        else: stats['file_date'] += 1
+    else:
+        stats['errors'] += 1
+        stats['failed'].append(res['src'])
+        logger.error(f"Error procesando {res['src']}: {res['error']}")
+
+def open_date_cache(dest_dir, logger):
+    """Abre (o crea) la caché de fechas en el directorio destino. Devuelve None si no es posible."""
+    try:
+        os.makedirs(dest_dir, exist_ok=True)
+        return DateCache(os.path.join(dest_dir, CACHE_FILENAME))
+    except (OSError, sqlite3.Error) as e:
+        logger.warning(f"No se pudo abrir la caché de fechas, se continúa sin ella: {e}")
+        return None
+
+class FileScanner:
+    """
+    Recorre el directorio origen en un hilo aparte y entrega las rutas a través de una
+    cola acotada, de modo que la organización empieza sin esperar a que termine el escaneo.
+    """
+    _DONE = object()
+
+    def __init__(self, src_dir):
+        self.src_dir = src_dir
+        self.scanned = 0
+        self.done = False
+        self.excluded = set()
+        self._queue = queue.Queue(maxsize=SCAN_QUEUE_SIZE)
+        self._thread = threading.Thread(target=self._walk, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def exclude_dir(self, path):
+        """Excluye un directorio (p. ej. el destino si está dentro del origen)."""
+        self.excluded.add(os.path.abspath(path))
+
+    def _is_excluded(self, path):
+        path = os.path.abspath(path)
+        return any(path == d or path.startswith(d + os.sep) for d in self.excluded)
+
+    def _walk(self):
+        try:
+            for root, dirs, files in os.walk(self.src_dir):
+                dirs[:] = [d for d in dirs if not self._is_excluded(os.path.join(root, d))]
+                for f in files:
+                    self._queue.put(os.path.join(root, f))
+                    self.scanned += 1
+        finally:
+            self.done = True
+            self._queue.put(self._DONE)
+
+    def __iter__(self):
+        while True:
+            path = self._queue.get()
+            if path is self._DONE:
+                return
+            if not self.excluded or not self._is_excluded(path):
+                yield path
+
+    def has_files(self):
+        """Espera hasta encontrar el primer archivo o terminar el recorrido."""
+        while not self.done and self.scanned == 0:
+            self._thread.join(0.05)
+        return self.scanned > 0
+
+def _print_progress(completed, files):
+    if isinstance(files, FileScanner):
+        pending = "" if files.done else " (escaneando...)"
+        line = f"\rEscaneados: {files.scanned}{pending} | Procesados: {completed}"
+    else:
+        line = f"\rProgreso: {completed}/{len(files)} archivos procesados"
+    print(Fore.GREEN + line + Style.RESET_ALL, end='', flush=True)
+
+def _device_of(path):
+    try:
+        return os.stat(path).st_dev
+    except OSError:
+        return None
+
+def choose_executor(requested, cpu_heavy=False):
+    """Resuelve el modo 'auto': procesos solo si hay etapas que consumen mucha CPU."""
+    if requested != 'auto':
+        return requested
+    return 'procesos' if cpu_heavy else 'hilos'
+
+def run_organizer(files, dest_dir, workers, logger, duplicates='omitir', executor='procesos',
+                  io_limits=(SOURCE_IO_LIMIT, DEST_IO_LIMIT), dry_run=False, transfer='copiar'):
     """
     Ejecuta el proceso de organización de forma secuencial o en paralelo.
+    `files` puede ser una lista o un FileScanner: en ese caso los archivos se procesan
+    a medida que se encuentran y nunca hay más de TASKS_PER_WORKER tareas por trabajador.
+    Con executor='hilos' las tareas se ejecutan en un ThreadPoolExecutor y la E/S se limita
+    por dispositivo según io_limits (lecturas por origen, escrituras por destino).
+    Con dry_run=True solo se calcula el destino de cada archivo: no se escribe nada.
     """
-    total = len(files_list)
-    processed, errors, exif_count, file_date_count, filename_count = 0, 0, 0, 0, 0
-    tasks = [(fp, dest_dir) for fp in files_list]
+    global _io_limiter
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+    stats = new_stats()
+    cache = None if dry_run else open_date_cache(dest_dir, logger)
+    options = {'cache_path': cache.db_path if cache else None, 'duplicates': duplicates,
+               'dest_dev': _device_of(dest_dir), 'dry_run': dry_run, 'transfer': transfer}
+    pending_cache = []
+    tasks = ((fp, dest_dir, options) for fp in files)
 
+    def flush_cache(force=False):
+        if cache and (force or len(pending_cache) >= CACHE_FLUSH_EVERY):
+            try:
+                cache.put_many(pending_cache)
+            except sqlite3.Error as e:
+                logger.warning(f"No se pudo actualizar la caché de fechas: {e}")
+            pending_cache.clear()
+
+    completed = 0
     if workers == 1:
         print(Fore.CYAN + "Iniciando proceso en modo secuencial..." + Style.RESET_ALL)
-        for i, task in enumerate(tasks, 1):
-            res = organize_single_file(task)
-            if res['ok']:
-                processed += 1
-                logger.info(f"OK ({res['date_source']}): {res['src']} -> {res['dest']}")
-                if res['date_source'] == 'EXIF': exif_count += 1
-                elif res['date_source'] == 'Nombre': filename_count += 1
-                else: file_date_count += 1
-            else:
-                errors += 1
-                logger.error(f"Error procesando {res['src']}: {res['error']}")
-            print(Fore.GREEN + f"\rProgreso: {i}/{total} archivos procesados" + Style.RESET_ALL, end='')
+        for task in tasks:
+            record_result(organize_single_file(task), stats, logger, pending_cache)
+            flush_cache()
+            completed += 1
+            _print_progress(completed, files)
     else:
-        print(Fore.CYAN + f"Iniciando proceso en paralelo con {workers} trabajadores..." + Style.RESET_ALL)
-        with ProcessPoolExecutor(max_workers=workers) as executor:
-            futures = {executor.submit(organize_single_file, t): t for t in tasks}
-            completed = 0
-            for future in as_completed(futures):
+        if executor == 'hilos':
+            print(Fore.CYAN + f"Iniciando proceso con {workers} hilos de E/S "
+                  f"(máx. {io_limits[0]} lecturas por origen, {io_limits[1]} escrituras por destino)..." + Style.RESET_ALL)
+            _io_limiter = DeviceLimiter(*io_limits)
+            pool = ThreadPoolExecutor(max_workers=workers)
+        else:
+            print(Fore.CYAN + f"Iniciando proceso en paralelo con {workers} trabajadores..." + Style.RESET_ALL)
+            pool = ProcessPoolExecutor(max_workers=workers)
+        with pool:
+            in_flight = set()
+            for task in tasks:
+                in_flight.add(pool.submit(organize_single_file, task))
+                if len(in_flight) < workers * TASKS_PER_WORKER:
+                    continue
+                finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    record_result(future.result(), stats, logger, pending_cache)
+                    completed += 1
+                flush_cache()
+                _print_progress(completed, files)
+            for future in as_completed(in_flight):
+                record_result(future.result(), stats, logger, pending_cache)
                 completed += 1
-                res = future.result()
-                if res['ok']:
-                    processed += 1
-                    logger.info(f"OK ({res['date_source']}): {res['src']} -> {res['dest']}")
-                    if res['date_source'] == 'EXIF': exif_count += 1
-                    elif res['date_source'] == 'Nombre': filename_count += 1
-                    else: file_date_count += 1
-                else:
-                    errors += 1
-                    logger.error(f"Error procesando {res['src']}: {res['error']}")
-                print(Fore.GREEN + f"\rProgreso: {completed}/{total} archivos procesados" + Style.RESET_ALL, end='')
+                _print_progress(completed, files)
+
+        _io_limiter = None
 
+    flush_cache(force=True)
+    if cache:
+        cache.close()
+    stats['total'] = completed
     print('\n' + Fore.GREEN + 'Proceso finalizado.' + Style.RESET_ALL)
-    return total, processed, errors, exif_count, file_date_count, filename_count
+    return stats
+
+def compute_dhash(path):
+    """
+    Hash perceptual (dHash) de 64 bits: compara el brillo de píxeles vecinos en una
+    miniatura de 9x8. En JPEG se usa draft() para que el decodificador escale la imagen
+    en el dominio DCT (1/2, 1/4, 1/8) en lugar de decodificarla a tamaño completo.
+    Devuelve None si el archivo no se puede leer como imagen.
+    """
+    try:
+        from PIL import Image
+        with Image.open(path) as img:
+            img.draft('L', (DHASH_SIZE * 8, DHASH_SIZE * 8))
+            thumb = img.convert('L').resize((DHASH_SIZE + 1, DHASH_SIZE), Image.BILINEAR)
+            pixels = thumb.tobytes()
+    except Exception:
+        return None
+    try:
+        import numpy as np
+    except ImportError:
+        bits = 0
+        for row in range(DHASH_SIZE):
+            line = pixels[row * (DHASH_SIZE + 1):(row + 1) * (DHASH_SIZE + 1)]
+            for col in range(DHASH_SIZE):
+                bits = (bits << 1) | (line[col + 1] > line[col])
+        return bits
+    grid = np.frombuffer(pixels, dtype=np.uint8).reshape(DHASH_SIZE, DHASH_SIZE + 1)
+    return int.from_bytes(np.packbits(grid[:, 1:] > grid[:, :-1]).tobytes(), 'big')
+
+def _hamming(a, b):
+    return bin(a ^ b).count('1')
+
+class HammingIndex:
+    """
+    Índice multi-tabla (multi-index hashing) para buscar hashes de 64 bits a distancia de
+    Hamming <= max_distance sin comparar contra todos. El hash se divide en `chunks` trozos;
+    si dos hashes difieren en <= d bits, al menos un trozo difiere en <= d // chunks bits
+    (principio del palomar), así que basta con mirar los cubos de ese trozo y sus vecinos.
+    """
+    def __init__(self, max_distance=BURST_MAX_DISTANCE, chunks=4):
+        self.max_distance = max_distance
+        self.chunk_bits = 64 // chunks
+        self.chunk_mask = (1 << self.chunk_bits) - 1
+        self.tables = [{} for _ in range(chunks)]
+        radius = max_distance // chunks
+        # Máscaras XOR de todos los vecinos de un trozo a distancia <= radius
+        masks = {0}
+        for _ in range(radius):
+            masks |= {m | (1 << bit) for m in masks for bit in range(self.chunk_bits)}
+        self.neighbor_masks = sorted(masks)
+        self.values = {}
+
+    def add(self, value, item):
+        self.values[item] = value
+        for i, table in enumerate(self.tables):
+            chunk = (value >> (i * self.chunk_bits)) & self.chunk_mask
+            table.setdefault(chunk, []).append(item)
+
+    def search(self, value):
+        """Devuelve los elementos cuyo hash está a distancia <= max_distance de `value`."""
+        candidates = set()
+        for i, table in enumerate(self.tables):
+            chunk = (value >> (i * self.chunk_bits)) & self.chunk_mask
+            for mask in self.neighbor_masks:
+                bucket = table.get(chunk ^ mask)
+                if bucket:
+                    candidates.update(bucket)
+        values, limit = self.values, self.max_distance
+        return [item for item in candidates if bin(value ^ values[item]).count('1') <= limit]
+
+def group_near_duplicates(hashes, max_distance=BURST_MAX_DISTANCE):
+    """
+    Agrupa rutas con hashes cercanos. `hashes` es {ruta: hash}. Devuelve una lista de
+    grupos (listas de rutas ordenadas) con al menos dos imágenes.
+    """
+    index = HammingIndex(max_distance)
+    # Unión-búsqueda: las ráfagas se encadenan (A~B, B~C => A, B y C en el mismo grupo)
+    parent = {path: path for path in hashes}
+    def find(path):
+        while parent[path] != path:
+            parent[path] = parent[parent[path]]
+            path = parent[path]
+        return path
+    for path, value in hashes.items():
+        # Cada imagen solo se compara con las ya indexadas: cada par se evalúa una vez
+        for other in index.search(value):
+            root_a, root_b = find(path), find(other)
+            if root_a != root_b:
+                parent[root_b] = root_a
+        index.add(value, path)
+    groups = {}
+    for path in hashes:
+        groups.setdefault(find(path), []).append(path)
+    return sorted((sorted(g) for g in groups.values() if len(g) > 1), key=lambda g: g[0])
+
+def write_burst_groups(dest_dir, groups, hashes):
+    """
+    Escribe los grupos en <destino>/_bursts: un informe CSV y una carpeta por grupo con
+    enlaces duros a las fotos (sin copias). Devuelve la ruta del informe.
+    """
+    import csv
+    bursts_dir = os.path.join(dest_dir, BURSTS_DIRNAME)
+    os.makedirs(bursts_dir, exist_ok=True)
+    # Los grupos de una ejecución anterior solo contienen enlaces: se regeneran
+    for entry in os.listdir(bursts_dir):
+        if entry.startswith('grupo_'):
+            shutil.rmtree(os.path.join(bursts_dir, entry), ignore_errors=True)
+    report_path = os.path.join(bursts_dir, 'informe_rafagas.csv')
+    with open(report_path, 'w', newline='', encoding='utf-8') as report:
+        writer = csv.writer(report)
+        writer.writerow(['grupo', 'ruta', 'dhash'])
+        for number, group in enumerate(groups, 1):
+            group_dir = os.path.join(bursts_dir, f"grupo_{number:05d}")
+            os.makedirs(group_dir, exist_ok=True)
+            for path in group:
+                writer.writerow([number, os.path.relpath(path, dest_dir), f"{hashes[path]:016x}"])
+                link = os.path.join(group_dir, os.path.basename(path))
+                if not os.path.exists(link):
+                    try:
+                        os.link(path, link)
+                    except OSError:
+                        pass  # Sin enlaces duros: el informe CSV sigue siendo válido
+    return report_path
+
+def run_burst_stage(dest_dir, workers, logger, max_distance=BURST_MAX_DISTANCE):
+    """
+    Etapa opcional tras organizar: calcula el dHash de cada imagen del destino (reutilizando
+    los guardados en la caché), agrupa ráfagas y casi duplicados y los escribe en _bursts.
+    Devuelve (imágenes analizadas, grupos encontrados, ruta del informe).
+    """
+    print(Fore.CYAN + "Buscando ráfagas y fotos casi duplicadas..." + Style.RESET_ALL)
+    cache = open_date_cache(dest_dir, logger)
+    hashes, pending = {}, []
+    for root, dirs, files in os.walk(dest_dir):
+        dirs[:] = [d for d in dirs if d != BURSTS_DIRNAME]
+        for f in files:
+            if not f.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            path = os.path.join(root, f)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            cached = cache.get_hash(path, st.st_size, st.st_mtime_ns) if cache else None
+            if cached is not None:
+                hashes[path] = cached
+            else:
+                pending.append((path, st.st_size, st.st_mtime_ns))
+
+    # Decodificar y reducir imágenes sí es trabajo de CPU: aquí se usan procesos
+    paths = [p for p, _, _ in pending]
+    if workers > 1 and len(paths) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            computed = list(executor.map(compute_dhash, paths, chunksize=64))
+    else:
+        computed = [compute_dhash(p) for p in paths]
+    new_entries = []
+    for (path, size, mtime_ns), value in zip(pending, computed):
+        if value is None:
+            logger.warning(f"No se pudo calcular el hash perceptual de {path}")
+            continue
+        hashes[path] = value
+        new_entries.append((path, size, mtime_ns, value))
+    if cache:
+        try:
+            cache.put_hashes(new_entries)
+        except sqlite3.Error as e:
+            logger.warning(f"No se pudieron guardar los hashes perceptuales: {e}")
+        cache.close()
+
+    groups = group_near_duplicates(hashes, max_distance)
+    report_path = write_burst_groups(dest_dir, groups, hashes)
+    for number, group in enumerate(groups, 1):
+        logger.info(f"RÁFAGA {number:05d}: {', '.join(group)}")
+    return len(hashes), len(groups), report_path
+
+class InotifyWatcher:
+    """Envoltorio mínimo de inotify (vía ctypes) que vigila un árbol de directorios completo."""
+    _EVENT = struct.Struct('iIII')  # wd, mask, cookie, len
+
+    def __init__(self, excluded=()):
+        import ctypes
+        import ctypes.util
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or None, use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 falló")
+        self.watches = {}  # wd -> directorio
+        self.excluded = {os.path.abspath(d) for d in excluded}
+
+    def add_watch(self, path):
+        if os.path.abspath(path) in self.excluded:
+            return
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), DAEMON_EVENT_MASK)
+        if wd >= 0:
+            self.watches[wd] = path
+
+    def watch_tree(self, root):
+        """Vigila `root` y todos sus subdirectorios. Devuelve los archivos que ya contienen."""
+        found = []
+        for dirpath, dirs, files in os.walk(root):
+            dirs[:] = [d for d in dirs if os.path.abspath(os.path.join(dirpath, d)) not in self.excluded]
+            self.add_watch(dirpath)
+            found.extend(os.path.join(dirpath, f) for f in files)
+        return found
+
+    def read_events(self, timeout):
+        """Espera hasta `timeout` segundos y devuelve una lista de (máscara, ruta)."""
+        import select
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        data = os.read(self.fd, 64 * 1024)
+        events, offset = [], 0
+        while offset + self._EVENT.size <= len(data):
+            wd, mask, _, length = self._EVENT.unpack_from(data, offset)
+            offset += self._EVENT.size
+            name = data[offset:offset + length].split(b'\0', 1)[0]
+            offset += length
+            if mask & IN_IGNORED:
+                self.watches.pop(wd, None)
+                continue
+            directory = self.watches.get(wd)
+            path = os.path.join(directory, os.fsdecode(name)) if directory and name else directory
+            events.append((mask, path))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+def load_daemon_state(dest_dir):
+    try:
+        with open(os.path.join(dest_dir, DAEMON_STATE_FILENAME), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'marca_ctime_ns': 0}
+
+def save_daemon_state(dest_dir, state):
+    """Guarda el progreso del demonio de forma atómica (escritura en temporal + rename)."""
+    path = os.path.join(dest_dir, DAEMON_STATE_FILENAME)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def run_daemon(src_dir, dest_dir, workers, logger, duplicates='omitir', executor='hilos',
+               io_limits=(SOURCE_IO_LIMIT, DEST_IO_LIMIT)):
+    """
+    Organiza continuamente `src_dir` a partir de eventos inotify (cierre tras escritura y
+    archivos movidos). Espera DAEMON_DEBOUNCE_SECONDS sin cambios antes de procesar un archivo,
+    los agrupa en lotes para run_organizer y guarda en el destino una marca (ctime) de lo ya
+    organizado: al reiniciar solo se procesan los archivos llegados después de esa marca.
+    Los archivos que fallan se reintentan cada DAEMON_RETRY_SECONDS (o antes, si cambian) y la
+    marca nunca los supera, así que un reinicio también los vuelve a intentar.
+    """
+    os.makedirs(dest_dir, exist_ok=True)
+    state = load_daemon_state(dest_dir)
+    watcher = InotifyWatcher(excluded=[dest_dir])
+    pending = {}  # ruta -> (momento del último evento, tamaño, ctime_ns)
+    failed = {}   # ruta -> (momento del fallo, ctime_ns)
+    highest = state['marca_ctime_ns']  # ctime más reciente que ya ha pasado por run_organizer
+
+    def touch(path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            pending.pop(path, None)  # Borrado o renombrado antes de procesarlo
+            failed.pop(path, None)
+            return
+        failed.pop(path, None)
+        pending[path] = (time.monotonic(), st.st_size, st.st_ctime_ns)
+
+    def catch_up(paths):
+        # ctime cambia también al mover un archivo dentro de la carpeta, a diferencia de mtime
+        for path in paths:
+            try:
+                if os.stat(path).st_ctime_ns > state['marca_ctime_ns']:
+                    touch(path)
+            except OSError:
+                pass
+
+    # Primero se añaden las vigilancias y después se recorre: nada llega sin ser visto
+    catch_up(watcher.watch_tree(src_dir))
+    print(Fore.CYAN + f"Modo demonio: vigilando {src_dir} ({len(watcher.watches)} carpetas, "
+          f"{len(pending)} archivos pendientes). Ctrl+C para salir." + Style.RESET_ALL)
+    logger.info(f"Demonio iniciado sobre {src_dir} -> {dest_dir}")
+    try:
+        while True:
+            for mask, path in watcher.read_events(timeout=1.0):
+                if mask & IN_Q_OVERFLOW:
+                    logger.warning("Cola de inotify desbordada: se revisa la carpeta de entrada")
+                    catch_up(watcher.watch_tree(src_dir))
+                elif mask & IN_ISDIR:
+                    if mask & (IN_CREATE | IN_MOVED_TO) and path:
+                        catch_up(watcher.watch_tree(path))  # Carpeta nueva o movida con contenido
+                elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO) and path:
+                    touch(path)
+
+            # Archivos listos: sin eventos durante el periodo de espera y con tamaño estable
+            now = time.monotonic()
+            for path, (failed_at, _) in list(failed.items()):
+                if now - failed_at >= DAEMON_RETRY_SECONDS:
+                    touch(path)
+            ready = []
+            for path, (last_event, size, _) in list(pending.items()):
+                if now - last_event < DAEMON_DEBOUNCE_SECONDS:
+                    continue
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    del pending[path]
+                    continue
+                if st.st_size != size:
+                    touch(path)  # Todavía se está escribiendo
+                else:
+                    ready.append(path)
+            if not ready:
+                continue
+
+            batch = sorted(ready, key=lambda p: pending[p][2])[:DAEMON_BATCH_SIZE]
+            batch_ctimes = [pending.pop(p)[2] for p in batch]
+            stats = run_organizer(batch, dest_dir, workers, logger, duplicates, executor, io_limits)
+            logger.info(f"Lote del demonio: {stats}")
+            failed_now = set(stats['failed'])
+            for path, ctime_ns in zip(batch, batch_ctimes):
+                if path in failed_now:
+                    failed[path] = (time.monotonic(), ctime_ns)
+
+            # La marca nunca supera a un archivo que siga pendiente o que haya fallado
+            highest = max(highest, max(batch_ctimes))
+            mark = highest
+            waiting = [c for _, _, c in pending.values()] + [c for _, c in failed.values()]
+            if waiting:
+                mark = min(mark, min(waiting) - 1)
+            if mark > state['marca_ctime_ns']:
+                state['marca_ctime_ns'] = mark
+                save_daemon_state(dest_dir, state)
+    except KeyboardInterrupt:
+        print(Fore.YELLOW + "\nDemonio detenido." + Style.RESET_ALL)
+    finally:
+        watcher.close()
+        logger.info("Demonio detenido")
+
+def _existing_parent(path):
+    """El propio directorio o su primer antecesor existente (el destino puede no existir aún)."""
+    path = os.path.abspath(path)
+    while not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+
+def _probe_read(paths):
+    """Lee archivos del origen durante como mucho PROBE_MAX_SECONDS. Devuelve bytes/s o None."""
+    read, start = 0, time.perf_counter()
+    for path in paths:
+        try:
+            with open(path, 'rb', buffering=0) as f:
+                while read < PROBE_READ_BYTES:
+                    chunk = f.read(1024 * 1024)
+                    if not chunk:
+                        break
+                    read += len(chunk)
+        except OSError:
+            continue
+        if read >= PROBE_READ_BYTES or time.perf_counter() - start > PROBE_MAX_SECONDS:
+            break
+    elapsed = time.perf_counter() - start
+    return read / elapsed if read and elapsed > 0 else None
+
+def _probe_write(directory):
+    """
+    Escribe un archivo temporal en el destino (con fsync) y crea/borra enlaces duros.
+    Devuelve (bytes/s de escritura, segundos por operación de metadatos, error). Si no se puede
+    escribir (sin permiso, disco lleno...) la velocidad y el coste quedan en None y error explica
+    el motivo: el espacio libre ya se encarga de marcar los modos que no caben.
+    """
+    import tempfile
+    block = os.urandom(1024 * 1024)
+    probe_path = None
+    try:
+        fd, probe_path = tempfile.mkstemp(prefix='.sondeo_', dir=directory)
+        written, start = 0, time.perf_counter()
+        with os.fdopen(fd, 'wb') as f:
+            while written < PROBE_WRITE_BYTES and time.perf_counter() - start < PROBE_MAX_SECONDS:
+                f.write(block)
+                written += len(block)
+            f.flush()
+            os.fsync(f.fileno())
+        write_speed = written / (time.perf_counter() - start)
+        # Mover o enlazar en el mismo disco solo cuesta operaciones de metadatos
+        metadata_cost = None
+        try:
+            start = time.perf_counter()
+            for i in range(PROBE_METADATA_OPS):
+                link = f"{probe_path}.{i}"
+                os.link(probe_path, link)
+                os.remove(link)
+            metadata_cost = (time.perf_counter() - start) / (2 * PROBE_METADATA_OPS)
+        except OSError:
+            pass  # Sin enlaces duros en este sistema de archivos
+        return write_speed, metadata_cost, None
+    except OSError as e:
+        return None, None, e.strerror or str(e)
+    finally:
+        if probe_path:
+            try:
+                os.remove(probe_path)
+            except OSError:
+                pass
+
+def estimate_run(src_dir, dest_dir, excluded=()):
+    """
+    Estimación previa: suma archivos y bytes del origen, mide la velocidad real de lectura
+    (origen) y escritura (destino) con un sondeo corto, consulta el espacio libre y proyecta
+    duración y espacio necesario para cada modo de transferencia.
+    """
+    excluded = {os.path.abspath(d) for d in excluded}
+    n_files, total_bytes, sample = 0, 0, []
+    for root, dirs, files in os.walk(src_dir):
+        dirs[:] = [d for d in dirs if os.path.abspath(os.path.join(root, d)) not in excluded]
+        for f in files:
+            path = os.path.join(root, f)
+            try:
+                size = os.stat(path).st_size
+            except OSError:
+                continue
+            n_files += 1
+            total_bytes += size
+            if len(sample) < 64:
+                sample.append(path)
+
+    dest_probe_dir = _existing_parent(dest_dir)
+    read_speed = _probe_read(sample)
+    write_speed, metadata_cost, write_error = _probe_write(dest_probe_dir)
+    free_bytes = shutil.disk_usage(dest_probe_dir).free
+    usable_bytes = free_bytes - SPACE_SAFETY_MARGIN * shutil.disk_usage(dest_probe_dir).total
+    same_device = _device_of(src_dir) == _device_of(dest_probe_dir)
+
+    copy_speed = min(s for s in (read_speed, write_speed) if s) if (read_speed or write_speed) else None
+    copy_seconds = total_bytes / copy_speed if copy_speed else None
+    metadata_seconds = n_files * metadata_cost if metadata_cost is not None else None
+    modes = {
+        'copiar': {'seconds': copy_seconds, 'bytes': total_bytes, 'available': True},
+        # Entre discos distintos, mover es copiar y después borrar el original
+        'mover': {'seconds': metadata_seconds if same_device else copy_seconds,
+                  'bytes': 0 if same_device else total_bytes, 'available': True},
+        'enlazar': {'seconds': metadata_seconds, 'bytes': 0,
+                    'available': same_device and metadata_cost is not None},
+    }
+    for mode in modes.values():
+        mode['fits'] = mode['bytes'] <= usable_bytes
+    return {'files': n_files, 'bytes': total_bytes, 'read_speed': read_speed,
+            'write_speed': write_speed, 'write_error': write_error, 'free_bytes': free_bytes, 'usable_bytes': usable_bytes,
+            'same_device': same_device, 'modes': modes}
+
+def _format_bytes(n):
+    for unit in ('B', 'KB', 'MB', 'GB', 'TB'):
+        if abs(n) < 1024 or unit == 'TB':
+            return f"{n:.1f} {unit}" if unit != 'B' else f"{n} B"
+        n /= 1024
+
+def _format_seconds(seconds):
+    if seconds is None:
+        return "desconocido"
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    return f"{hours}h {rest // 60:02d}m {rest % 60:02d}s" if hours else f"{rest // 60}m {rest % 60:02d}s"
+
+def print_estimate(estimate):
+    speed = lambda s: f"{_format_bytes(s)}/s" if s else "desconocida"
+    print(Fore.YELLOW + "--- Estimación Previa ---" + Style.RESET_ALL)
+    print(f"Archivos en origen:   {estimate['files']} ({_format_bytes(estimate['bytes'])})")
+    print(f"Lectura en origen:    {speed(estimate['read_speed'])}")
+    print(f"Escritura en destino: {speed(estimate['write_speed'])}"
+          + (Fore.RED + f" (no se pudo escribir: {estimate['write_error']})" + Style.RESET_ALL
+             if estimate['write_error'] else ""))
+    print(f"Espacio libre:        {_format_bytes(estimate['free_bytes'])} "
+          f"({'mismo disco' if estimate['same_device'] else 'discos distintos'})")
+    for key, name in TRANSFER_MODES.items():
+        mode = estimate['modes'][name]
+        if not mode['available']:
+            status = Fore.RED + "no disponible (requiere el mismo disco y enlaces duros)" + Style.RESET_ALL
+        elif not mode['fits']:
+            status = Fore.RED + f"no cabe: necesita {_format_bytes(mode['bytes'])}" + Style.RESET_ALL
+        else:
+            status = f"~{_format_seconds(mode['seconds'])}, ocupa {_format_bytes(mode['bytes'])}"
+        print(f"  {key}: {name:<8} {status}")
+    print(Fore.YELLOW + "-------------------------" + Style.RESET_ALL)
+
+def benchmark_executors(n_files=2000, file_size=64 * 1024, workers=None):
+    """Compara el ejecutor por procesos y el de hilos sobre un árbol sintético temporal."""
+    import tempfile
+    import time
+    workers = workers or min(DEFAULT_IO_THREADS, (os.cpu_count() or 1) * 2)
+    logger = logging.getLogger('file_organizer_bench')
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+    payload = os.urandom(file_size)
+    with tempfile.TemporaryDirectory() as tmp:
+        src_dir = os.path.join(tmp, 'origen')
+        for i in range(n_files):
+            subdir = os.path.join(src_dir, f"carpeta_{i % 20:02d}")
+            os.makedirs(subdir, exist_ok=True)
+            name = f"IMG_2023{i % 12 + 1:02d}{i % 28 + 1:02d}_{i % 24:02d}{i % 60:02d}00_{i}.jpg"
+            with open(os.path.join(subdir, name), 'wb') as f:
+                f.write(payload[:file_size - 8] + i.to_bytes(8, 'little'))
+        files = [os.path.join(r, f) for r, _, fs in os.walk(src_dir) for f in fs]
+        timings = {}
+        for mode in ('procesos', 'hilos'):
+            dest_dir = os.path.join(tmp, f"destino_{mode}")
+            start = time.perf_counter()
+            run_organizer(files, dest_dir, workers, logger, executor=mode)
+            timings[mode] = time.perf_counter() - start
+    print(f"\nArchivos sintéticos:  {n_files} x {file_size // 1024} KB, {workers} trabajadores")
+    for mode, elapsed in timings.items():
+        print(f"  - {mode:<9} {elapsed:7.2f} s  ({n_files / elapsed:8.1f} archivos/s)")
+    print(f"Aceleración de hilos sobre procesos: x{timings['procesos'] / timings['hilos']:.2f}")
+
+# Límite del tiempo de importación del script y módulos que nunca deben cargarse al arrancar
+STARTUP_IMPORT_BUDGET_MS = 150
+STARTUP_FORBIDDEN_MODULES = ('PIL', 'piexif', 'colorama', 'numpy')
+
+def profile_startup(budget_ms=STARTUP_IMPORT_BUDGET_MS):
+    """
+    Prueba de regresión del arranque: ejecuta `python -X importtime <script> --version` y
+    muestra el desglose de importaciones por paquete. Falla si se supera el presupuesto o
+    si se importa al arrancar alguno de STARTUP_FORBIDDEN_MODULES.
+    """
+    import subprocess
+    proc = subprocess.run([sys.executable, '-X', 'importtime', os.path.abspath(__file__), '--version'],
+                          capture_output=True, text=True)
+    # Formato de cada línea: "import time: <propio us> | <acumulado us> | <módulo>"
+    totals = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        package = name.strip().split('.')[0]
+        totals[package] = totals.get(package, 0) + int(self_us)
+    total_ms = sum(totals.values()) / 1000
+    print(f"Tiempo total de importación: {total_ms:.1f} ms (límite {budget_ms} ms)")
+    for package, us in sorted(totals.items(), key=lambda item: -item[1])[:15]:
+        print(f"  {package:<24} {us / 1000:7.2f} ms")
+    forbidden = [m for m in STARTUP_FORBIDDEN_MODULES if m in totals]
+    if forbidden:
+        print(f"Módulos pesados importados al arrancar: {', '.join(forbidden)}")
+    return proc.returncode == 0 and total_ms <= budget_ms and not forbidden
 
 # --- Funciones de Utilidad y Principal ---
 
@@ -258,74 +1495,185 @@ def setup_logger(log_file):
         logger.addHandler(file_handler)
     return logger
 
+def default_dest_for(src_dir):
+    return os.path.join(os.path.dirname(src_dir) or src_dir, f"{os.path.basename(os.path.abspath(src_dir))}_organizado")
+
 def get_input(prompt, default=None):
     value = input(Fore.YELLOW + prompt + Style.RESET_ALL)
     return value if value else default
 
+def parse_args():
+    parser = argparse.ArgumentParser(description=f"{SCRIPT_NAME} v{VERSION}")
+    parser.add_argument('--version', action='version', version=f"{SCRIPT_NAME} {VERSION}")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="Simula la organización: muestra el destino de cada archivo sin copiar nada")
+    parser.add_argument('--perfil-arranque', action='store_true',
+                        help="Mide el tiempo de importación del script (python -X importtime) y falla si supera el límite")
+    parser.add_argument('--bench-nombres', action='store_true',
+                        help="Ejecuta el micro-benchmark de fechas en nombres de archivo y sale")
+    parser.add_argument('--bench-ejecutor', action='store_true',
+                        help="Compara los ejecutores por procesos y por hilos sobre un árbol sintético y sale")
+    parser.add_argument('--demonio', action='store_true',
+                        help="Organiza continuamente la carpeta origen con inotify (solo Linux)")
+    parser.add_argument('--origen', help="Directorio a organizar (evita la pregunta)")
+    parser.add_argument('--destino', help="Directorio destino (evita la pregunta)")
+    parser.add_argument('--estimar', action='store_true',
+                        help="Antes de confirmar, mide bytes, velocidad de los discos y espacio libre y proyecta la duración de cada modo")
+    parser.add_argument('--rafagas', action='store_true',
+                        help=f"Tras organizar, agrupa ráfagas y fotos casi duplicadas en '{BURSTS_DIRNAME}'")
+    parser.add_argument('--umbral-rafagas', type=int, default=BURST_MAX_DISTANCE,
+                        help=f"Bits distintos (de 64) entre fotos de una misma ráfaga (por defecto: {BURST_MAX_DISTANCE})")
+    parser.add_argument('--ejecutor', choices=EXECUTOR_MODES, default='auto',
+                        help="hilos: E/S limitada por dispositivo; procesos: solo para etapas con mucha CPU (por defecto: auto)")
+    parser.add_argument('--lecturas-por-disco', type=int, default=SOURCE_IO_LIMIT,
+                        help=f"Lecturas simultáneas por dispositivo origen con hilos (por defecto: {SOURCE_IO_LIMIT})")
+    parser.add_argument('--escrituras-por-disco', type=int, default=DEST_IO_LIMIT,
+                        help=f"Escrituras simultáneas por dispositivo destino con hilos (por defecto: {DEST_IO_LIMIT})")
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
+    if args.bench_nombres:
+        sys.exit(0 if benchmark_filename_dates() else 1)
+    if args.bench_ejecutor:
+        benchmark_executors()
+        sys.exit(0)
+    if args.perfil_arranque:
+        sys.exit(0 if profile_startup() else 1)
+    executor = choose_executor(args.ejecutor, cpu_heavy=args.rafagas)
+    io_limits = (max(1, args.lecturas_por_disco), max(1, args.escrituras_por_disco))
+
     ensure_dependencies()
+    setup_locale()
     clear_screen()
     print_banner()
 
+    log_dir = "logs"
+    if args.demonio:
+        if not sys.platform.startswith('linux'):
+            sys.exit("El modo demonio necesita Linux (inotify).")
+        src_dir = args.origen or get_input("Ingrese el directorio de entrada a vigilar: ")
+        if not src_dir or not os.path.isdir(src_dir):
+            sys.exit("El directorio no existe.")
+        dest_dir = args.destino or get_input(f"Ingrese el directorio destino [{default_dest_for(src_dir)}]: ",
+                                             default_dest_for(src_dir))
+        os.makedirs(log_dir, exist_ok=True)
+        logger = setup_logger(os.path.join(log_dir, f"organizer_daemon_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"))
+        workers = DEFAULT_IO_THREADS if executor == 'hilos' else (os.cpu_count() or 1)
+        run_daemon(src_dir, dest_dir, workers, logger, executor=executor, io_limits=io_limits)
+        return
+
     # 1. Directorio Origen
     while True:
-        src_dir = get_input("Ingrese el directorio a organizar: ")
-        if not os.path.isdir(src_dir):
+        src_dir = args.origen or get_input("Ingrese el directorio a organizar: ")
+        args.origen = None  # Si no es válido o está vacío, se pregunta en el siguiente intento
+        if not src_dir or not os.path.isdir(src_dir):
             print(Fore.RED + "El directorio no existe. Intente nuevamente." + Style.RESET_ALL)
             continue
         
-        print(Fore.CYAN + "Escaneando archivos, por favor espere..." + Style.RESET_ALL)
-        files_list = [os.path.join(r, f) for r, _, fs in os.walk(src_dir) for f in fs]
+        # El escaneo sigue en segundo plano mientras se responden las preguntas
+        scanner = FileScanner(src_dir).start()
         
-        if not files_list:
+        if not scanner.has_files():
             retry = get_input(Fore.RED + "No se encontraron archivos. ¿Probar con otro directorio? (S/n): " + Style.RESET_ALL, "S").lower()
             if retry != 's': sys.exit("Saliendo del programa.")
             else: continue
         break
 
     # 2. Directorio Destino
-    default_dest = os.path.join(os.path.dirname(src_dir) or src_dir, f"{os.path.basename(os.path.abspath(src_dir))}_organizado")
-    dest_dir = get_input(f"Ingrese el directorio destino [{default_dest}]: ", default_dest)
+    default_dest = default_dest_for(src_dir)
+    dest_dir = args.destino or get_input(f"Ingrese el directorio destino [{default_dest}]: ", default_dest)
+    scanner.exclude_dir(dest_dir)
 
-    # 3. Número de procesos
+    # 3. Número de procesos (o de hilos de E/S)
     cpu_count = os.cpu_count() or 1
-    prompt = f"CPUs detectadas: {cpu_count}. ¿Cuántos procesos desea usar? (1 = secuencial, máx {cpu_count}) [1]: "
+    if executor == 'hilos':
+        max_workers = 64
+        prompt = f"¿Cuántos hilos de E/S desea usar? (1 = secuencial, máx {max_workers}) [{DEFAULT_IO_THREADS}]: "
+        default_workers = str(DEFAULT_IO_THREADS)
+    else:
+        max_workers = cpu_count
+        prompt = f"CPUs detectadas: {cpu_count}. ¿Cuántos procesos desea usar? (1 = secuencial, máx {cpu_count}) [1]: "
+        default_workers = "1"
     try:
-        n_procs = int(get_input(prompt, "1"))
-        n_procs = max(1, min(cpu_count, n_procs))
+        n_procs = int(get_input(prompt, default_workers))
+        n_procs = max(1, min(max_workers, n_procs))
     except ValueError:
         n_procs = 1
 
-    # 4. Resumen y Confirmación
+    # 4. Duplicados exactos
+    dup_option = get_input("¿Qué hacer con los duplicados exactos? (1: Omitirlos, 2: Enlazarlos con enlace duro) [1]: ", "1")
+    duplicates = DUPLICATE_ACTIONS.get(dup_option, 'omitir')
+
+    # 5. Modo de transferencia (con estimación previa de coste si se pidió)
+    estimate = None
+    if args.estimar and not args.dry_run:
+        print(Fore.CYAN + "Estimando tamaño, velocidad de los discos y espacio libre..." + Style.RESET_ALL)
+        estimate = estimate_run(src_dir, dest_dir, excluded=[dest_dir])
+        print_estimate(estimate)
+    while True:
+        transfer_option = get_input("Modo de transferencia (1: Copiar, 2: Mover, 3: Enlazar con enlace duro) [1]: ", "1")
+        transfer = TRANSFER_MODES.get(transfer_option, 'copiar')
+        if estimate is None:
+            break
+        mode = estimate['modes'][transfer]
+        if not mode['available']:
+            print(Fore.RED + "Ese modo no está disponible entre estos directorios." + Style.RESET_ALL)
+        elif not mode['fits']:
+            # Rechazar antes de empezar cualquier trabajo: llenaría el disco destino
+            print(Fore.RED + f"No hay espacio suficiente en el destino para '{transfer}': se necesitan "
+                  f"{_format_bytes(mode['bytes'])} y hay {_format_bytes(max(0, estimate['usable_bytes']))} utilizables." + Style.RESET_ALL)
+        else:
+            break
+
+    # 6. Resumen y Confirmación
     clear_screen()
     print_banner()
     print(Fore.YELLOW + "--- Resumen de la Configuración ---" + Style.RESET_ALL)
     print(f"Directorio origen:    {src_dir}")
     print(f"Directorio destino:   {dest_dir}")
-    print(f"Total de archivos:    {len(files_list)}")
-    print(f"Procesos a utilizar:  {n_procs}")
+    print(f"Archivos encontrados: {scanner.scanned}" + ("" if scanner.done else " (el escaneo continúa)"))
+    print(f"Trabajadores:         {n_procs} ({executor})")
+    print(f"Transferencia:        {transfer.capitalize()}")
+    if estimate:
+        print(f"Duración estimada:    {_format_seconds(estimate['modes'][transfer]['seconds'])}")
+    print(f"Duplicados exactos:   {duplicates.capitalize()}")
+    print(f"Ráfagas:              {'Sí (umbral ' + str(args.umbral_rafagas) + ' bits)' if args.rafagas else 'No'}")
+    if args.dry_run:
+        print(Fore.CYAN + "Modo simulación:      no se copiará ni se creará nada en el destino" + Style.RESET_ALL)
     print(Fore.YELLOW + "-----------------------------------\n" + Style.RESET_ALL)
     
     confirm = get_input(Fore.GREEN + "¿La configuración es correcta? (S/n): " + Style.RESET_ALL, "S").lower()
     if confirm != "s":
         sys.exit("Proceso cancelado por el usuario.")
 
-    # 5. Preparar Logger y Ejecutar
-    log_dir = "logs"
+    # 7. Preparar Logger y Ejecutar
     os.makedirs(log_dir, exist_ok=True)
     log_file = os.path.join(log_dir, f"organizer_v1_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log")
     logger = setup_logger(log_file)
     
-    total, processed, errors, exif, fallback, filename = run_organizer(files_list, dest_dir, n_procs, logger)
+    stats = run_organizer(scanner, dest_dir, n_procs, logger, duplicates, executor, io_limits,
+                          args.dry_run, transfer)
+    run_bursts = args.rafagas and not args.dry_run
+    if run_bursts:
+        images, burst_groups, burst_report = run_burst_stage(
+            dest_dir, min(n_procs, cpu_count), logger, args.umbral_rafagas)
 
-    # 6. Resultado Final
+    # 8. Resultado Final
     print("\n" + Fore.GREEN + "--- Resultados Finales ---" + Style.RESET_ALL)
-    print(f"Total de archivos encontrados: {total}")
-    print(f"Procesados con éxito:        {processed}")
-    print(f"  - Con fecha EXIF:          {exif}")
-    print(f"  - Con fecha del nombre:    {filename}")
-    print(f"  - Con fecha de archivo:    {fallback}")
-    print(Fore.RED + f"Errores (ver log):           {errors}" + Style.RESET_ALL)
+    print(f"Total de archivos encontrados: {stats['total']}")
+    label = "Simulados con éxito:" if args.dry_run else "Procesados con éxito:"
+    print(f"{label:<29}{stats['processed']}")
+    print(f"  - Con fecha EXIF:          {stats['exif']}")
+    print(f"  - Con fecha del vídeo:     {stats['video']}")
+    print(f"  - Con fecha del nombre:    {stats['filename']}")
+    print(f"  - Con fecha de archivo:    {stats['file_date']}")
+    print(f"Duplicados exactos:          {stats['duplicates']}")
+    print(f"Fechas leídas de la caché:   {stats['cached']}")
+    if run_bursts:
+        print(f"Grupos de ráfagas:           {burst_groups} (de {images} imágenes)")
+        print(f"Informe de ráfagas en:       {burst_report}")
+    print(Fore.RED + f"Errores (ver log):           {stats['errors']}" + Style.RESET_ALL)
     print(Fore.CYAN + f"Registro detallado en:       {log_file}" + Style.RESET_ALL)
 
 if __name__ == '__main__':